@@ -0,0 +1,212 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+const WORKER_SCRIPT = path.join(__dirname, 'pdf_to_json_test', 'conversion_worker.py');
+
+// One long-lived Python conversion worker (pdf_to_json_test/conversion_worker.py)
+class ConversionWorker {
+  constructor(pool) {
+    this.pool = pool;
+    this.job = null;
+    this.jobsDone = 0;
+    this.ready = false;
+    this.started = false;
+    this.exited = false;
+
+    const args = [WORKER_SCRIPT];
+    if (pool.maxJobsPerWorker) {
+      args.push('--max-jobs', String(pool.maxJobsPerWorker));
+    }
+
+    this.process = spawn(pool.python, args, {
+      cwd: path.dirname(WORKER_SCRIPT),
+      env: { ...process.env, PYTHONUNBUFFERED: '1' },
+      stdio: ['pipe', 'pipe', 'pipe']
+    });
+
+    readline.createInterface({ input: this.process.stdout }).on('line', (line) => this.onLine(line));
+    this.process.stderr.on('data', (data) => this.log(data.toString()));
+    // A write to a worker that just died fails here; the exit handler deals with it
+    this.process.stdin.on('error', () => {});
+
+    this.process.on('error', (error) => this.onExit(error));
+    this.process.on('exit', (code, signal) => this.onExit(new Error(`Conversion worker exited (code ${code}, signal ${signal})`)));
+  }
+
+  log(text) {
+    text = text.trim();
+    if (text && !text.includes('fitz` API is deprecated')) {
+      console.error(`[conversion worker ${this.process.pid}] ${text}`);
+    }
+  }
+
+  onLine(line) {
+    // Import-time warnings can reach stdout before the worker redirects it
+    if (!line.startsWith('{')) {
+      this.log(line);
+      return;
+    }
+
+    let message;
+    try {
+      message = JSON.parse(line);
+    } catch (error) {
+      this.log(`unexpected output: ${line}`);
+      return;
+    }
+
+    if (message.method === 'ready') {
+      this.ready = true;
+      this.started = true;
+      this.pool.dispatch();
+      return;
+    }
+    if (message.method === 'recycle') {
+      this.ready = false; // Exits after this; the pool starts a replacement
+      return;
+    }
+
+    const job = this.job;
+    if (!job || message.id !== job.id) {
+      return;
+    }
+    this.job = null;
+
+    // The worker exits after its last job; stop handing it work before that happens
+    if (job.method === 'convert' || job.method === 'convert_data') {
+      this.jobsDone++;
+      if (this.pool.maxJobsPerWorker && this.jobsDone >= this.pool.maxJobsPerWorker) {
+        this.ready = false;
+      }
+    }
+
+    if (message.error) {
+      const error = new Error(message.error.message);
+      error.code = message.error.code;
+      job.reject(error);
+    } else {
+      job.resolve(message.result);
+    }
+    this.pool.dispatch();
+  }
+
+  onExit(error) {
+    if (this.exited) {
+      return;
+    }
+    this.exited = true;
+    this.ready = false;
+
+    if (this.job) {
+      this.job.reject(error);
+      this.job = null;
+    }
+    this.pool.onWorkerExit(this);
+  }
+
+  get idle() {
+    return this.ready && !this.job && !this.exited;
+  }
+
+  run(job) {
+    this.job = job;
+    this.process.stdin.write(JSON.stringify({
+      jsonrpc: '2.0',
+      id: job.id,
+      method: job.method,
+      params: job.params
+    }) + '\n');
+  }
+
+  stop() {
+    this.exited = true;
+    this.process.stdin.end(JSON.stringify({ jsonrpc: '2.0', id: 0, method: 'shutdown' }) + '\n');
+  }
+}
+
+// Small pool of warm Python workers; jobs queue until a worker is free
+class ConversionPool {
+  constructor(options = {}) {
+    this.size = options.size || 2;
+    this.python = options.python || 'python3';
+    this.maxJobsPerWorker = options.maxJobsPerWorker || 0;
+    this.workers = [];
+    this.queue = [];
+    this.nextId = 1;
+    this.closed = false;
+    this.fill();
+  }
+
+  fill() {
+    while (this.workers.length < this.size) {
+      this.workers.push(new ConversionWorker(this));
+    }
+  }
+
+  request(method, params) {
+    if (this.closed) {
+      return Promise.reject(new Error('Conversion pool is closed'));
+    }
+    this.fill();
+    return new Promise((resolve, reject) => {
+      this.queue.push({ id: this.nextId++, method, params, resolve, reject });
+      this.dispatch();
+    });
+  }
+
+  // params: { pdf_path, output_dir, output_name, html, passthrough, image_store, image_profile }
+  convert(params) {
+    return this.request('convert', params);
+  }
+
+  // Convert a PDF held in memory (e.g. an upload); nothing is written to disk
+  convertBuffer(buffer, name, options = {}) {
+    return this.request('convert_data', {
+      data: buffer.toString('base64'),
+      name,
+      include_images: options.includeImages === true,
+      passthrough: options.passthrough === true,
+      image_profile: options.imageProfile
+    });
+  }
+
+  dispatch() {
+    for (const worker of this.workers) {
+      if (!this.queue.length) {
+        return;
+      }
+      if (worker.idle) {
+        worker.run(this.queue.shift());
+      }
+    }
+  }
+
+  onWorkerExit(worker) {
+    this.workers = this.workers.filter(w => w !== worker);
+    if (this.closed) {
+      return;
+    }
+    if (!worker.started) {
+      // Python or the converter is broken; fail waiting jobs instead of respawning in a loop
+      for (const job of this.queue.splice(0)) {
+        job.reject(new Error('Conversion worker failed to start'));
+      }
+      return;
+    }
+    this.fill();
+  }
+
+  close() {
+    this.closed = true;
+    for (const job of this.queue.splice(0)) {
+      job.reject(new Error('Conversion pool is closed'));
+    }
+    for (const worker of this.workers) {
+      worker.stop();
+    }
+    this.workers = [];
+  }
+}
+
+module.exports = { ConversionPool };
@@ -8,10 +8,100 @@ import os
 import sys
 import json
 import glob
+import html
+import time
+import heapq
+import hashlib
+import multiprocessing
+import fitz
+from collections import deque
+from functools import partial
+from multiprocessing.connection import wait
 from pathlib import Path
 from datetime import datetime
-from convert_procedure import generate_html_from_json
-from pdf_converter_robust import PDFProcedureConverter
+from convert_procedure import generate_html
+from pdf_converter_robust import CONVERTER_VERSION, PDFProcedureConverter
+from image_store import ImageStore
+from pdf_images import DEFAULT_PROFILE, ENCODER_PROFILES
+from pipeline import convert_pipelined
+
+# Records input hashes and outputs so unchanged PDFs are skipped on later runs
+MANIFEST_FILE = 'batch_manifest.json'
+MANIFEST_VERSION = 1
+
+# Checkpoint of the run in progress; replayed by --resume after a crash
+JOURNAL_FILE = 'batch_journal.jsonl'
+
+# Every conversion of a --shard run (failed ones included), combined by `merge`
+SHARD_RESULTS_FILE = 'batch_results.json'
+
+# Machine-readable list of every procedure and its output files
+INDEX_FILE = 'index.json'
+
+# How duplicate exports are detected: identical bytes only, or also the same
+# page count and first-page text (re-exports that differ only in metadata)
+DEDUPE_MODES = ('off', 'exact', 'structure')
+
+# Seconds per unit of the conversion cost model, fitted on the 47 distinct PDFs
+# in downloads/ (r = 0.81). Only the ratios matter for ordering; the ETA is
+# rescaled to the speed actually observed once documents finish.
+COST_MODEL = {'base': 0.05, 'pages': 0.026, 'images': 0.036, 'image_mb': 0.42}
+
+# Watchdog defaults: a stuck or runaway document is killed, not waited on
+DOCUMENT_TIMEOUT = 300      # seconds per document
+MEMORY_LIMIT_MB = 2048      # resident memory per worker
+RECYCLE_AFTER = 50          # documents per worker process before it is replaced
+WATCHDOG_INTERVAL = 0.5     # seconds between limit checks
+
+
+def aggregate_stage_timings(conversions):
+    """Sum stage timings and counters over every conversion that recorded metrics"""
+    stages = {}
+    counters = {}
+    for conv in conversions:
+        metrics = conv.get('metrics')
+        if not metrics:
+            continue
+        for name, seconds in metrics['stages'].items():
+            totals = stages.setdefault(name, {'total': 0.0, 'max': 0.0, 'max_pdf': '', 'documents': 0})
+            totals['total'] += seconds
+            totals['documents'] += 1
+            if seconds >= totals['max']:
+                totals['max'], totals['max_pdf'] = seconds, conv['pdf_name']
+        for name, value in metrics['counters'].items():
+            counters[name] = counters.get(name, 0) + value
+    return stages, counters
+
+
+def stage_timings_html(conversions):
+    """Dashboard section showing where conversion time goes"""
+    stages, counters = aggregate_stage_timings(conversions)
+    if not stages:
+        return ""
+
+    total_time = sum(totals['total'] for totals in stages.values())
+    rows = ""
+    for name, totals in stages.items():
+        share = totals['total'] / total_time if total_time else 0
+        rows += f"""
+                <tr>
+                    <td>{name}</td>
+                    <td>{totals['total']:.2f}s</td>
+                    <td>{share:.0%}</td>
+                    <td>{totals['total'] / totals['documents'] * 1000:.0f} ms</td>
+                    <td>{totals['max'] * 1000:.0f} ms ({Path(totals['max_pdf']).name})</td>
+                </tr>"""
+    counter_text = " · ".join(f"{name}: {value:,}" for name, value in counters.items())
+
+    return f"""
+        <div class="header">
+            <h2>⏱️ Stage Timings ({total_time:.2f}s total)</h2>
+            <table class="stage-table">
+                <tr><th>Stage</th><th>Total</th><th>Share</th><th>Mean</th><th>Slowest</th></tr>{rows}
+            </table>
+            <p class="stat-label">{counter_text}</p>
+        </div>
+"""
 
 
 def create_dashboard(conversions):
@@ -174,6 +264,29 @@ def create_dashboard(conversions):
             background: #e9ecef;
         }}
 
+        .error-detail {{
+            color: #721c24;
+            font-size: 0.9em;
+            margin-bottom: 10px;
+        }}
+
+        .alias-note {{
+            color: #666;
+            font-size: 0.9em;
+            margin-bottom: 10px;
+        }}
+
+        .stage-table {{
+            width: 100%;
+            border-collapse: collapse;
+        }}
+
+        .stage-table th, .stage-table td {{
+            text-align: left;
+            padding: 6px 10px;
+            border-bottom: 1px solid #e0e0e0;
+        }}
+
         .timestamp {{
             text-align: center;
             color: #666;
@@ -209,7 +322,7 @@ def create_dashboard(conversions):
                 </div>
             </div>
         </div>
-
+{stage_timings_html(conversions)}
         <div class="conversions-grid">
 """
 
@@ -225,6 +338,8 @@ def create_dashboard(conversions):
                 </div>
                 <div class="card-body">
                     <div class="status {status_class}">{status_text}</div>
+                    {f'<div class="error-detail">{html.escape(conv["error"])}</div>' if conv.get('error') else ''}
+                    {f'<div class="alias-note">♻️ Duplicate export of {html.escape(Path(conv["alias_of"]).name)}</div>' if conv.get('alias_of') else ''}
 
                     <div class="metrics">
                         <div class="metric">
@@ -271,12 +386,577 @@ def create_dashboard(conversions):
     return 'dashboard.html'
 
 
-def batch_convert(pdf_pattern='*.pdf', output_prefix='converted'):
-    """Convert multiple PDFs matching a pattern"""
-    pdf_files = glob.glob(pdf_pattern)
+def probe_cost(pdf_file):
+    """Page count, image count and image stream bytes, read without decoding anything"""
+    probe = {'pages': 0, 'images': 0, 'image_mb': 0.0}
+    try:
+        with fitz.open(pdf_file) as doc:
+            xrefs = {img[0] for page in doc for img in page.get_images(full=True)}
+            stream_bytes = 0
+            for xref in xrefs:
+                kind, value = doc.xref_get_key(xref, "Length")
+                if kind == "int":
+                    stream_bytes += int(value)
+            probe.update(pages=doc.page_count, images=len(xrefs), image_mb=stream_bytes / (1024 * 1024))
+    except Exception:
+        pass  # Unreadable PDFs fail fast in conversion; cost them as empty
+    return probe
+
+
+def estimate_seconds(probe):
+    """Predicted conversion time of a probed PDF under COST_MODEL"""
+    return COST_MODEL['base'] + sum(COST_MODEL[key] * probe[key] for key in ('pages', 'images', 'image_mb'))
+
+
+def lpt_makespan(costs, workers):
+    """Finish time of the last worker when costs are dealt largest first to the least loaded worker"""
+    loads = [0.0] * max(1, min(workers, len(costs)))
+    for cost in sorted(costs, reverse=True):
+        heapq.heapreplace(loads, loads[0] + cost)
+    return max(loads)
+
+
+class Progress:
+    """Counts finished documents and estimates the time left from the cost model
+
+    The estimate is the model's remaining seconds divided by how fast
+    estimated work has actually been completed so far, which accounts for
+    this machine and the worker count.
+    """
+
+    def __init__(self, estimates):
+        self.estimates = estimates
+        self.remaining = sum(estimates.values())
+        self.completed = 0.0
+        self.done = 0
+        self.started = time.monotonic()
+
+    def finish(self, pdf_file):
+        """Record a finished document and return its progress prefix"""
+        self.done += 1
+        cost = self.estimates.get(pdf_file, 0.0)
+        self.completed += cost
+        self.remaining -= cost
+        prefix = f"[{self.done}/{len(self.estimates)}] "
+        if self.remaining > 0 and self.completed > 0:
+            rate = self.completed / (time.monotonic() - self.started)
+            prefix += f"(ETA {format_duration(self.remaining / rate)}) "
+        return prefix
+
+
+def format_duration(seconds):
+    """Seconds as 42s, 3m05s or 1h02m"""
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+def failed_conversion(pdf_file, output_name, error):
+    """Dashboard entry for a PDF that could not be converted"""
+    return {
+        'pdf_name': pdf_file,
+        'title': f"Failed: {Path(pdf_file).stem}",
+        'output_name': output_name,
+        'json_file': '',
+        'html_file': '',
+        'report_file': '',
+        'total_steps': 0,
+        'total_images': 0,
+        'warnings': 0,
+        'errors': 1,
+        'valid': False,
+        'avg_confidence': 0,
+        'error': str(error)
+    }
+
+
+def output_name_for(pdf_file, output_prefix='converted'):
+    """Output file stem for a PDF"""
+    return f"{output_prefix}_{Path(pdf_file).stem}"
+
+
+def convert_one(pdf_file, output_prefix='converted', passthrough=False, image_store_dir=None,
+                image_profile=DEFAULT_PROFILE, derivatives=False):
+    """Convert a single PDF and return its dashboard entry
+
+    Never raises: failures are returned as a failed entry so one bad PDF
+    cannot take down the rest of the batch (or a worker process).
+    """
+    output_name = output_name_for(pdf_file, output_prefix)
+
+    try:
+        # Convert PDF
+        image_store = ImageStore(image_store_dir) if image_store_dir else None
+        converter = PDFProcedureConverter(pdf_file, output_name, verbose=False,
+                                          passthrough=passthrough, image_store=image_store,
+                                          image_profile=image_profile, derivatives=derivatives)
+        result = converter.convert()
+
+        # Generate HTML straight from the in-memory result
+        html_file = generate_html(result.to_dict(), f"{output_name}.html")
+
+        return conversion_entry(pdf_file, output_name, result, html_file)
+
+    except Exception as e:
+        return failed_conversion(pdf_file, output_name, e)
+
+
+def write_result(pdf_file, result, output_prefix='converted', passthrough=False, image_profile=DEFAULT_PROFILE,
+                 derivatives=False):
+    """Write the outputs of an already analyzed result (pipeline writer stage) and return its entry"""
+    output_name = output_name_for(pdf_file, output_prefix)
+    converter = PDFProcedureConverter(pdf_file, output_name, verbose=False,
+                                      passthrough=passthrough, image_profile=image_profile,
+                                      derivatives=derivatives)
+    result = converter.write_outputs(result)
+    html_file = generate_html(result.to_dict(), f"{output_name}.html")
+    return conversion_entry(pdf_file, output_name, result, html_file)
+
+
+def conversion_entry(pdf_file, output_name, result, html_file):
+    """Dashboard entry for a successful conversion"""
+    return {
+        'pdf_name': pdf_file,
+        'title': result.title,
+        'output_name': output_name,
+        'json_file': result.json_file,
+        'html_file': html_file,
+        'report_file': result.report_file,
+        'total_steps': len(result.steps),
+        'total_images': result.total_images,
+        'warnings': result.total_warnings,
+        'errors': 0,
+        'valid': result.total_warnings == 0,
+        'avg_confidence': result.avg_confidence,
+        'metrics': result.metrics.to_dict()
+    }
+
+
+def print_result(conversion):
+    """Print the outcome of one conversion"""
+    if conversion['errors']:
+        print(f"❌ Failed to convert {conversion['pdf_name']}: {conversion.get('error', 'unknown error')}")
+    else:
+        print(f"✅ Successfully converted: {conversion['title']}")
+
+
+def _worker_loop(conn, convert):
+    """Worker process body: convert each PDF the supervisor sends until told to stop"""
+    while True:
+        try:
+            pdf_file = conn.recv()
+        except EOFError:
+            return
+        if pdf_file is None:
+            return
+        conn.send(convert(pdf_file))
+
+
+def rss_mb(pid):
+    """Resident memory of a process in MB, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class SupervisedWorker:
+    """A conversion process the supervisor can time, measure and kill"""
+
+    def __init__(self, convert):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=_worker_loop, args=(child_conn, convert), daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.pdf_file = None
+        self.started = 0.0
+        self.documents = 0
+
+    def assign(self, pdf_file):
+        self.pdf_file = pdf_file
+        self.started = time.monotonic()
+        self.conn.send(pdf_file)
+
+    def finish(self):
+        pdf_file, self.pdf_file = self.pdf_file, None
+        self.documents += 1
+        return pdf_file
+
+    def limit_exceeded(self, timeout, memory_limit_mb):
+        """Describe the limit the current document broke, if any"""
+        elapsed = time.monotonic() - self.started
+        if timeout and elapsed > timeout:
+            return f"Timed out after {elapsed:.0f}s (limit {timeout}s)"
+        if memory_limit_mb:
+            rss = rss_mb(self.process.pid)
+            if rss is not None and rss > memory_limit_mb:
+                return f"Exceeded memory limit ({rss:.0f} MB > {memory_limit_mb} MB)"
+        return None
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        """Ask the worker to exit; kill it if it does not"""
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+def convert_supervised(pdf_files, convert, workers, output_prefix='converted', timeout=DOCUMENT_TIMEOUT,
+                       memory_limit_mb=MEMORY_LIMIT_MB, recycle_after=RECYCLE_AFTER, on_result=None,
+                       progress=None):
+    """Run conversions in worker processes under a watchdog
+
+    A document that runs past timeout or pushes its worker past
+    memory_limit_mb gets its worker killed and replaced, and is recorded as a
+    failed conversion; a worker that dies is replaced the same way. Workers are
+    also replaced after recycle_after documents. Documents are handed out in
+    the order given. Results are reported as they finish (and passed to
+    on_result) but returned in input order.
+    """
+    conversions = [None] * len(pdf_files)
+    positions = {pdf_file: i for i, pdf_file in enumerate(pdf_files)}
+    pending = deque(pdf_files)
+    pool = [SupervisedWorker(convert) for _ in range(min(workers, len(pdf_files)))]
+    progress = progress or Progress({pdf_file: 0.0 for pdf_file in pdf_files})
+    done = 0
+
+    def record(pdf_file, conversion):
+        nonlocal done
+        done += 1
+        conversions[positions[pdf_file]] = conversion
+        print(progress.finish(pdf_file), end="")
+        print_result(conversion)
+        if on_result:
+            on_result(pdf_file, conversion)
+
+    try:
+        while done < len(pdf_files):
+            for i, worker in enumerate(pool):
+                if worker.pdf_file is None and pending:
+                    if recycle_after and worker.documents >= recycle_after:
+                        worker.stop()
+                        pool[i] = worker = SupervisedWorker(convert)
+                    worker.assign(pending.popleft())
+
+            busy = [worker for worker in pool if worker.pdf_file is not None]
+            ready = wait([worker.conn for worker in busy], timeout=WATCHDOG_INTERVAL)
+
+            for worker in busy:
+                i = pool.index(worker)
+                if worker.conn in ready:
+                    try:
+                        conversion = worker.conn.recv()
+                    except (EOFError, OSError):
+                        # The worker itself died (e.g. MuPDF crashed or the OOM killer struck)
+                        worker.process.join()
+                        pdf_file = worker.finish()
+                        error = f"Worker process died (exit code {worker.process.exitcode})"
+                        record(pdf_file, failed_conversion(pdf_file, output_name_for(pdf_file, output_prefix), error))
+                        worker.conn.close()
+                        pool[i] = SupervisedWorker(convert)
+                        continue
+                    record(worker.finish(), conversion)
+                    continue
+
+                error = worker.limit_exceeded(timeout, memory_limit_mb)
+                if error:
+                    worker.kill()
+                    pdf_file = worker.finish()
+                    record(pdf_file, failed_conversion(pdf_file, output_name_for(pdf_file, output_prefix), error))
+                    pool[i] = SupervisedWorker(convert)
+    finally:
+        for worker in pool:
+            if worker.pdf_file is not None:
+                worker.kill()
+            else:
+                worker.stop()
+
+    return conversions
+
+
+def file_sha256(path):
+    """Content hash of a file, read in chunks"""
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def parse_shard(text):
+    """'i/N' -> (i, N) with 1 <= i <= N"""
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {text!r}")
+    if not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got {index}")
+    return index, count
+
+
+def shard_of(pdf_file, count):
+    """1-based shard of a PDF: a hash of its path, so adding files never moves existing ones"""
+    digest = hashlib.sha256(os.path.normpath(pdf_file).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % count + 1
+
+
+def shard_path(path, shard):
+    """batch_manifest.json -> batch_manifest.shard-2-of-4.json"""
+    if not path or not shard:
+        return path
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.shard-{shard[0]}-of-{shard[1]}{ext}"
+
+
+def write_index(conversions, index_path=INDEX_FILE):
+    """Write the procedure index: title, steps and output files for every PDF"""
+    procedures = [{key: conv.get(key) for key in
+                   ('pdf_name', 'title', 'total_steps', 'valid', 'html_file', 'json_file', 'report_file', 'alias_of')
+                   if conv.get(key) is not None}
+                  for conv in conversions if not conv['errors']]
+    tmp_path = f"{index_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'generated': datetime.now().isoformat(), 'procedures': procedures}, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, index_path)
+    return index_path
+
+
+def save_shard_results(results_path, shard, conversions):
+    """Record every conversion of a shard run for `merge`"""
+    tmp_path = f"{results_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'shard': f"{shard[0]}/{shard[1]}", 'converter_version': CONVERTER_VERSION,
+                   'finished': datetime.now().isoformat(), 'conversions': conversions}, f, indent=2)
+    os.replace(tmp_path, results_path)
+
+
+def merge_shards(results_files):
+    """Combine the result files of --shard runs into one dashboard and index"""
+    shards = {}
+    counts = set()
+    for results_file in results_files:
+        with open(results_file, 'r', encoding='utf-8') as f:
+            results = json.load(f)
+        index, count = parse_shard(results['shard'])
+        counts.add(count)
+        shards[index] = results['conversions']
+        print(f"📥 {results_file}: shard {index}/{count}, {len(results['conversions'])} documents")
+
+    if not shards:
+        print("No shard results to merge")
+        return None
+    if len(counts) > 1:
+        raise ValueError(f"Shard results from runs with different shard counts: {sorted(counts)}")
+    missing = sorted(set(range(1, counts.pop() + 1)) - set(shards))
+    if missing:
+        print(f"⚠️  Missing shards: {', '.join(map(str, missing))}; the dashboard will be incomplete")
+
+    conversions = sorted((conv for conversions in shards.values() for conv in conversions),
+                         key=lambda conv: conv['pdf_name'])
+    dashboard_file = create_dashboard(conversions)
+    index_file = write_index(conversions)
+    print(f"\n👉 Merged {len(conversions)} documents into {dashboard_file} and {index_file}")
+    return dashboard_file
+
+
+def structure_fingerprint(pdf_file):
+    """Page count and first-page text hash
+
+    None if the PDF cannot be opened or its first page has no text (scanned
+    or image-only exports would otherwise all match on page count alone).
+    """
+    try:
+        with fitz.open(pdf_file) as doc:
+            page_count = doc.page_count
+            first_page = doc[0].get_text() if page_count else ""
+    except Exception:
+        return None
+    if not first_page.strip():
+        return None
+    return f"{page_count}:{hashlib.sha256(first_page.encode('utf-8')).hexdigest()}"
+
+
+def find_duplicates(pdf_files, pending, pdf_hashes, manifest, mode='structure'):
+    """Map duplicate exports in pending to the PDF whose conversion they can share
+
+    PDFs match on content hash or, in 'structure' mode, on structure_fingerprint().
+    Already converted PDFs are preferred as the source, so a new copy of a
+    procedure converted in an earlier run is not converted at all.
+    Returns (aliases, fingerprints).
+    """
+    fingerprints = {}
+    aliases = {}
+    if mode == 'off':
+        return aliases, fingerprints
+
+    pending_set = set(pending)
+    converted = [pdf_file for pdf_file in pdf_files
+                 if pdf_file not in pending_set and not manifest.get(pdf_file, {}).get('conversion', {}).get('alias_of')]
+    owners = {}
+    for pdf_file in converted + pending:
+        keys = [('sha256', pdf_hashes[pdf_file])]
+        if mode == 'structure':
+            entry = manifest.get(pdf_file, {})
+            if pdf_file not in pending_set and entry.get('sha256') == pdf_hashes[pdf_file] and 'fingerprint' in entry:
+                fingerprints[pdf_file] = entry['fingerprint']
+            else:
+                fingerprints[pdf_file] = structure_fingerprint(pdf_file)
+            if fingerprints[pdf_file]:
+                keys.append(('structure', fingerprints[pdf_file]))
+
+        owner = next((owners[key] for key in keys if key in owners), None)
+        if owner is not None and pdf_file in pending_set:
+            aliases[pdf_file] = owner
+            continue
+        for key in keys:
+            owners.setdefault(key, pdf_file)
+
+    return aliases, fingerprints
+
+
+def alias_conversion(conversion, pdf_file):
+    """Dashboard entry for a duplicate export that shares another PDF's outputs"""
+    alias = dict(conversion, pdf_name=pdf_file, alias_of=conversion['pdf_name'])
+    alias.pop('metrics', None)  # The time was spent once, on the source
+    return alias
+
+
+def load_manifest(manifest_path):
+    """Load the incremental build manifest (pdf path -> entry)"""
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        print(f"⚠️  Ignoring unreadable manifest {manifest_path}: {e}")
+        return {}
+    if manifest.get('version') != MANIFEST_VERSION:
+        return {}
+    return manifest.get('entries', {})
+
+
+def save_manifest(manifest_path, entries):
+    """Write the manifest atomically so a crash never leaves it half-written"""
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump({'version': MANIFEST_VERSION, 'entries': entries}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+
+def manifest_entry(conversion, pdf_hash, config, fingerprint=None):
+    """Record what produced a conversion and which files it wrote"""
+    entry = {
+        'sha256': pdf_hash,
+        'converter_version': CONVERTER_VERSION,
+        'config': config,
+        'outputs': [conversion['json_file'], conversion['html_file'], conversion['report_file']],
+        'conversion': conversion
+    }
+    if fingerprint:
+        entry['fingerprint'] = fingerprint
+    return entry
+
+
+def is_up_to_date(entry, pdf_hash, config):
+    """A PDF can be skipped if input, converter and options are unchanged and its outputs still exist"""
+    return (entry is not None and
+            entry.get('sha256') == pdf_hash and
+            entry.get('converter_version') == CONVERTER_VERSION and
+            entry.get('config') == config and
+            all(os.path.exists(path) for path in entry.get('outputs', [])))
+
+
+def read_journal(journal_path):
+    """Replay the checkpoint journal of an interrupted run (pdf path -> last record)"""
+    records = {}
+    if not journal_path or not os.path.exists(journal_path):
+        return records
+    with open(journal_path, 'r') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # Torn last line from the crash itself
+            records[record['pdf_name']] = record
+    return records
+
+
+class Journal:
+    """Append-only JSON lines checkpoint, flushed to disk after every document"""
+
+    def __init__(self, journal_path, resume=False):
+        self.journal_path = journal_path
+        if journal_path and resume:
+            self._drop_torn_tail()
+        self.file = open(journal_path, 'a' if resume else 'w') if journal_path else None
+
+    def _drop_torn_tail(self):
+        """Cut a partial last line left by a crash, so the next record starts on its own line"""
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, 'r+b') as f:
+            data = f.read()
+            if data and not data.endswith(b'\n'):
+                f.truncate(data.rfind(b'\n') + 1)
+
+    def record(self, pdf_file, pdf_hash, conversion):
+        """Checkpoint one finished document"""
+        if not self.file:
+            return
+        self.file.write(json.dumps({'pdf_name': pdf_file, 'sha256': pdf_hash, 'conversion': conversion}) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def complete(self):
+        """The run finished and its results are in the manifest; the journal is no longer needed"""
+        if self.file:
+            self.file.close()
+            os.remove(self.journal_path)
+            self.file = None
+
+
+def batch_convert(pdf_pattern='*.pdf', output_prefix='converted', passthrough=False, image_store_dir=None,
+                  workers=1, manifest_path=MANIFEST_FILE, force=False, journal_path=JOURNAL_FILE,
+                  resume=False, timeout=DOCUMENT_TIMEOUT, memory_limit_mb=MEMORY_LIMIT_MB,
+                  recycle_after=RECYCLE_AFTER, image_profile=DEFAULT_PROFILE, dedupe='structure',
+                  order='cost', shard=None, pipeline=False, derivatives=False):
+    """Convert multiple PDFs matching a pattern
+
+    With shard=(i, N) only the PDFs of shard i are converted, using their own
+    manifest and journal; results go to a shard results file for merge_shards()
+    instead of the dashboard. With pipeline, documents go through the staged
+    pipeline (pipeline.py) instead of the supervised workers; the watchdog
+    limits do not apply there.
+    """
+    pdf_files = sorted(glob.glob(pdf_pattern))
+
+    if shard:
+        total = len(pdf_files)
+        pdf_files = [pdf_file for pdf_file in pdf_files if shard_of(pdf_file, shard[1]) == shard[0]]
+        manifest_path = shard_path(manifest_path, shard)
+        journal_path = shard_path(journal_path, shard)
+        print(f"🧩 Shard {shard[0]}/{shard[1]}: {len(pdf_files)} of {total} PDFs")
 
     if not pdf_files:
         print(f"No PDF files found matching pattern: {pdf_pattern}")
+        if shard:
+            # An empty shard still reports in, so `merge` does not count it as missing
+            save_shard_results(shard_path(SHARD_RESULTS_FILE, shard), shard, [])
         return
 
     print(f"\n{'='*60}")
@@ -284,76 +964,120 @@ def batch_convert(pdf_pattern='*.pdf', output_prefix='converted'):
     print(f"{'='*60}")
     print(f"Found {len(pdf_files)} PDF files to convert\n")
 
-    conversions = []
-    successful = 0
-    failed = 0
+    # Skip documents whose PDF, converter and options have not changed
+    config = {'output_prefix': output_prefix, 'passthrough': passthrough, 'image_store': image_store_dir,
+              'image_profile': image_profile, 'derivatives': derivatives}
+    manifest = {} if force else load_manifest(manifest_path)
+    pdf_hashes = {pdf_file: file_sha256(pdf_file) for pdf_file in pdf_files}
+    pending = [pdf_file for pdf_file in pdf_files
+               if not is_up_to_date(manifest.get(pdf_file), pdf_hashes[pdf_file], config)]
+    # A duplicate is only as fresh as the conversion it shares
+    stale = set(pending)
+    pending = [pdf_file for pdf_file in pdf_files if pdf_file in stale or
+               manifest[pdf_file]['conversion'].get('alias_of') in stale]
 
-    for i, pdf_file in enumerate(pdf_files, 1):
-        print(f"\n[{i}/{len(pdf_files)}] Processing: {pdf_file}")
-        print("-" * 40)
+    # Documents finished by an interrupted run (same PDF content) are not redone
+    resumed = {}
+    if resume:
+        for pdf_file, record in read_journal(journal_path).items():
+            if (pdf_file in pending and record.get('sha256') == pdf_hashes[pdf_file] and
+                    not record['conversion']['errors']):
+                resumed[pdf_file] = record['conversion']
+        pending = [pdf_file for pdf_file in pending if pdf_file not in resumed]
+        print(f"↩️  Resuming: {len(resumed)} documents recovered from {journal_path}\n")
+    elif journal_path and os.path.exists(journal_path):
+        print(f"⚠️  Discarding journal of an interrupted run ({journal_path}); use --resume to continue it\n")
 
-        # Generate output name
-        base_name = Path(pdf_file).stem
-        output_name = f"{output_prefix}_{base_name}"
+    # Re-exports of the same procedure are converted once; the others share its outputs
+    aliases, fingerprints = find_duplicates(pdf_files, pending, pdf_hashes, manifest, dedupe)
+    if aliases:
+        pending = [pdf_file for pdf_file in pending if pdf_file not in aliases]
+        print(f"♻️  {len(aliases)} duplicate exports will reuse another PDF's conversion\n")
 
-        try:
-            # Convert PDF
-            converter = PDFProcedureConverter(pdf_file, output_name, verbose=False)
-            json_file, report_file = converter.convert()
-
-            # Generate HTML
-            html_file = generate_html_from_json(json_file)
-
-            # Load JSON to get statistics
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-
-            # Calculate statistics
-            total_warnings = sum(len(s.get('warnings', [])) for s in data['steps'])
-            total_images = sum(len(s.get('images', [])) for s in data['steps'])
-            avg_confidence = sum(s.get('confidence', 1.0) for s in data['steps']) / len(data['steps']) if data['steps'] else 0
-
-            conversion_info = {
-                'pdf_name': pdf_file,
-                'title': data['title'],
-                'output_name': output_name,
-                'json_file': json_file,
-                'html_file': html_file,
-                'report_file': report_file,
-                'total_steps': data['total_steps'],
-                'total_images': total_images,
-                'warnings': total_warnings,
-                'errors': 0,
-                'valid': total_warnings == 0,
-                'avg_confidence': avg_confidence
-            }
-
-            conversions.append(conversion_info)
-            successful += 1
-            print(f"✅ Successfully converted: {data['title']}")
-
-        except Exception as e:
-            print(f"❌ Failed to convert {pdf_file}: {e}")
-            failed += 1
-
-            # Add failed conversion to list
-            conversions.append({
-                'pdf_name': pdf_file,
-                'title': f"Failed: {base_name}",
-                'output_name': output_name,
-                'json_file': '',
-                'html_file': '',
-                'report_file': '',
-                'total_steps': 0,
-                'total_images': 0,
-                'warnings': 0,
-                'errors': 1,
-                'valid': False,
-                'avg_confidence': 0
-            })
-
-    # Create dashboard
-    dashboard_file = create_dashboard(conversions)
+    if len(pending) < len(pdf_files):
+        print(f"⏭️  {len(pdf_files) - len(pending)} up to date or duplicate, {len(pending)} to convert\n")
+
+    journal = Journal(journal_path, resume)
+    checkpoint = lambda pdf_file, conversion: journal.record(pdf_file, pdf_hashes[pdf_file], conversion)
+
+    if workers == 0:
+        workers = os.cpu_count() or 1
+
+    # Longest-processing-time first: a big document picked up last would set the finish time
+    estimates = {pdf_file: estimate_seconds(probe_cost(pdf_file)) for pdf_file in pending}
+    if order == 'cost':
+        pending.sort(key=lambda pdf_file: estimates[pdf_file], reverse=True)
+    progress = Progress(estimates)
+    if pending:
+        print(f"📐 Estimated work: {format_duration(sum(estimates.values()))} over {len(pending)} documents, "
+              f"about {format_duration(lpt_makespan(list(estimates.values()), workers))} "
+              f"with {min(workers, len(pending))} workers\n")
+
+    convert = partial(convert_one, output_prefix=output_prefix, passthrough=passthrough,
+                      image_store_dir=image_store_dir, image_profile=image_profile, derivatives=derivatives)
+
+    if pending and pipeline:
+        print(f"Converting in a pipeline with {workers} parse processes\n")
+
+        def report(pdf_file, conversion):
+            print(progress.finish(pdf_file), end="")
+            print_result(conversion)
+            checkpoint(pdf_file, conversion)
+
+        results = convert_pipelined(
+            pending, partial(output_name_for, output_prefix=output_prefix),
+            write=partial(write_result, output_prefix=output_prefix, passthrough=passthrough,
+                          image_profile=image_profile, derivatives=derivatives),
+            fail=lambda pdf_file, error: failed_conversion(pdf_file, output_name_for(pdf_file, output_prefix), error),
+            parse_workers=workers, passthrough=passthrough, image_profile=image_profile,
+            derivatives=derivatives, on_result=report)
+    elif pending and (workers > 1 or timeout or memory_limit_mb or recycle_after):
+        print(f"Converting with {min(workers, len(pending))} supervised worker processes\n")
+        results = convert_supervised(pending, convert, workers, output_prefix, timeout=timeout,
+                                     memory_limit_mb=memory_limit_mb, recycle_after=recycle_after,
+                                     on_result=checkpoint, progress=progress)
+    else:
+        results = []
+        for i, pdf_file in enumerate(pending, 1):
+            print(f"\n[{i}/{len(pending)}] Processing: {pdf_file}")
+            print("-" * 40)
+
+            conversion = convert(pdf_file)
+            results.append(conversion)
+            print(progress.finish(pdf_file), end="")
+            print_result(conversion)
+            checkpoint(pdf_file, conversion)
+
+    converted = dict(resumed)
+    converted.update(zip(pending, results))
+    for pdf_file, source in aliases.items():
+        conversion = converted[source] if source in converted else manifest[source]['conversion']
+        converted[pdf_file] = alias_conversion(conversion, pdf_file)
+
+    # Failed conversions are dropped from the manifest so they are retried next run
+    for pdf_file, conversion in converted.items():
+        if conversion['errors']:
+            manifest.pop(pdf_file, None)
+        else:
+            manifest[pdf_file] = manifest_entry(conversion, pdf_hashes[pdf_file], config,
+                                                fingerprints.get(pdf_file))
+    if manifest_path:
+        save_manifest(manifest_path, manifest)
+    journal.complete()
+
+    conversions = [converted[pdf_file] if pdf_file in converted else manifest[pdf_file]['conversion']
+                   for pdf_file in pdf_files]
+
+    successful = sum(1 for c in conversions if not c['errors'])
+    failed = len(conversions) - successful
+
+    # Create dashboard (a shard only sees part of the batch; `merge` builds it later)
+    if shard:
+        results_file = shard_path(SHARD_RESULTS_FILE, shard)
+        save_shard_results(results_file, shard, conversions)
+    else:
+        dashboard_file = create_dashboard(conversions)
+        write_index(conversions)
 
     # Print summary
     print(f"\n{'='*60}")
@@ -362,20 +1086,92 @@ def batch_convert(pdf_pattern='*.pdf', output_prefix='converted'):
     print(f"✅ Successful: {successful}")
     print(f"❌ Failed: {failed}")
     print(f"📊 Total procedures: {sum(c['total_steps'] for c in conversions)} steps")
-    print(f"\n👉 Open {dashboard_file} to view the conversion dashboard")
+    if shard:
+        print(f"\n👉 Wrote {results_file}; run `python batch_convert.py merge` once every shard is done")
+    else:
+        print(f"\n👉 Open {dashboard_file} to view the conversion dashboard")
 
 
 def main():
     """Main function"""
     import argparse
 
-    parser = argparse.ArgumentParser(description='Batch convert PDF procedures')
+    if sys.argv[1:2] == ['merge']:
+        parser = argparse.ArgumentParser(prog='batch_convert.py merge',
+                                         description='Combine --shard results into one dashboard and index')
+        parser.add_argument('results', nargs='*',
+                            help=f'Shard result files (default: {shard_path(SHARD_RESULTS_FILE, ("*", "*"))})')
+        args = parser.parse_args(sys.argv[2:])
+        results_files = args.results or sorted(glob.glob(shard_path(SHARD_RESULTS_FILE, ('*', '*'))))
+        try:
+            merge_shards(results_files)
+        except ValueError as e:
+            parser.error(str(e))
+        return
+
+    parser = argparse.ArgumentParser(description='Batch convert PDF procedures '
+                                                 '(or `batch_convert.py merge` to combine shard results)')
     parser.add_argument('--pattern', default='*.pdf', help='File pattern for PDFs (default: *.pdf)')
     parser.add_argument('--prefix', default='converted', help='Output file prefix (default: converted)')
+    parser.add_argument('--passthrough', action='store_true',
+                        help='Write embedded JPEG/PNG images as-is instead of re-encoding to PNG')
+    parser.add_argument('--image-store', metavar='DIR',
+                        help='Link images into a shared content-addressed store at DIR')
+    parser.add_argument('--image-profile', choices=list(ENCODER_PROFILES), default=DEFAULT_PROFILE,
+                        help='Image encoding: fast (quick PNG), compact (palette PNG), web (WebP) '
+                             f'(default: {DEFAULT_PROFILE})')
+    parser.add_argument('--derivatives', action='store_true',
+                        help='Also write thumbnail/medium image sizes and placeholders for the HTML page')
+    parser.add_argument('--dedupe', choices=DEDUPE_MODES, default='structure',
+                        help='Convert duplicate exports once: exact (same bytes), structure (also same page '
+                             'count and first-page text; default) or off')
+    parser.add_argument('--order', choices=('cost', 'name'), default='cost',
+                        help='Convert the most expensive PDFs first (cost; default) or in name order')
+    parser.add_argument('--shard', metavar='I/N',
+                        help='Convert only shard I of N (hash of the file path); combine the shards with `merge`')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Overlap reading, parsing (--workers processes), image encoding and writing '
+                             'of consecutive PDFs; no --timeout/--max-memory watchdog, no --image-store')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of worker processes (default: 1, serial; 0 = one per CPU)')
+    parser.add_argument('--manifest', default=MANIFEST_FILE,
+                        help=f'Incremental build manifest (default: {MANIFEST_FILE})')
+    parser.add_argument('--force', action='store_true',
+                        help='Reconvert every PDF even if the manifest says it is up to date')
+    parser.add_argument('--resume', action='store_true',
+                        help=f'Continue an interrupted run from {JOURNAL_FILE}')
+    parser.add_argument('--timeout', type=float, default=DOCUMENT_TIMEOUT,
+                        help=f'Kill a document after this many seconds (default: {DOCUMENT_TIMEOUT}; 0 = no limit)')
+    parser.add_argument('--max-memory', type=int, default=MEMORY_LIMIT_MB, metavar='MB',
+                        help=f'Kill a worker whose resident memory exceeds MB (default: {MEMORY_LIMIT_MB}; 0 = no limit)')
+    parser.add_argument('--recycle-after', type=int, default=RECYCLE_AFTER, metavar='N',
+                        help=f'Replace each worker process after N documents (default: {RECYCLE_AFTER}; 0 = never)')
 
     args = parser.parse_args()
 
-    batch_convert(args.pattern, args.prefix)
+    try:
+        shard = parse_shard(args.shard) if args.shard else None
+    except ValueError as e:
+        parser.error(str(e))
+    if args.pipeline and args.image_store:
+        parser.error('--pipeline writes images itself and cannot use --image-store')
+
+    batch_convert(args.pattern, args.prefix,
+                  passthrough=args.passthrough,
+                  image_store_dir=args.image_store,
+                  image_profile=args.image_profile,
+                  derivatives=args.derivatives,
+                  dedupe=args.dedupe,
+                  order=args.order,
+                  shard=shard,
+                  pipeline=args.pipeline,
+                  workers=args.workers,
+                  manifest_path=args.manifest,
+                  force=args.force,
+                  resume=args.resume,
+                  timeout=args.timeout,
+                  memory_limit_mb=args.max_memory,
+                  recycle_after=args.recycle_after)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Conversion Benchmark Suite
+Times every converter against the committed Scribe PDFs and fails on regressions
+"""
+
+import os
+import sys
+import json
+import glob
+import time
+import shutil
+import resource
+import tempfile
+import statistics
+import multiprocessing
+from queue import Empty
+from contextlib import redirect_stdout
+from datetime import datetime
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PDFS = [os.path.join(SCRIPT_DIR, "3cx_forwarding.pdf"), os.path.join(SCRIPT_DIR, "twilio_logs.pdf")]
+DEFAULT_CORPUS = os.path.join(SCRIPT_DIR, "..", "downloads", "*.pdf")
+IMAGE_EXTENSIONS = (".png", ".jpeg", ".jpg", ".webp")
+
+# Metrics compared against a baseline; all are "lower is better"
+GATED_METRICS = ("wall_time", "cpu_time", "peak_rss_kb")
+
+# A conversion still running after this many seconds is killed and counted as an error
+RUN_TIMEOUT = 600
+
+
+def _run_robust(pdf_path, output_name):
+    from pdf_converter_robust import PDFProcedureConverter
+    return PDFProcedureConverter(pdf_path, output_name, verbose=False).convert().metrics.to_dict()
+
+
+def _run_fixed(pdf_path, output_name):
+    from pdf_converter_final_fixed import FixedPDFConverter
+    FixedPDFConverter(pdf_path, output_name).convert()
+
+
+def _run_perfect(pdf_path, output_name):
+    from pdf_converter_perfect import PerfectPDFConverter
+    PerfectPDFConverter(pdf_path, output_name).convert()
+
+
+def _run_final(pdf_path, output_name):
+    from pdf_to_html_final import FinalConverter
+    FinalConverter(pdf_path, output_name).extract_and_convert()
+
+
+CONVERTERS = {
+    "robust": _run_robust,
+    "fixed": _run_fixed,
+    "perfect": _run_perfect,
+    "final": _run_final,
+}
+
+
+def _measure(converter_name, pdf_path, work_dir, queue):
+    """Child process body: run one conversion and report its cost"""
+    sys.path.insert(0, SCRIPT_DIR)
+    os.chdir(work_dir)
+    result = {"converter": converter_name, "pdf": os.path.basename(pdf_path)}
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            metrics = CONVERTERS[converter_name](pdf_path, "bench")
+        result["error"] = None
+        # Converters that record per-stage timings report them alongside the totals
+        if metrics:
+            result["stages"] = metrics["stages"]
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["wall_time"] = time.perf_counter() - wall_start
+    result["cpu_time"] = time.process_time() - cpu_start
+    result["peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    queue.put(result)
+
+
+def _output_stats(work_dir):
+    """Count images and bytes a conversion left on disk"""
+    images_written = 0
+    bytes_written = 0
+    for dirpath, _dirnames, filenames in os.walk(work_dir):
+        for filename in filenames:
+            bytes_written += os.path.getsize(os.path.join(dirpath, filename))
+            if dirpath.endswith("_images") and filename.lower().endswith(IMAGE_EXTENSIONS):
+                images_written += 1
+    return images_written, bytes_written
+
+
+def run_once(converter_name, pdf_path):
+    """Run one conversion in a fresh process so RSS and imports are measured in isolation"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    work_dir = tempfile.mkdtemp(prefix="bench_")
+    try:
+        process = context.Process(target=_measure, args=(converter_name, pdf_path, work_dir, queue))
+        process.start()
+        started = time.perf_counter()
+        result = None
+        while result is None:
+            try:
+                result = queue.get(timeout=1)
+            except Empty:
+                # A child that segfaults or is OOM-killed never reports back
+                if not process.is_alive():
+                    try:
+                        result = queue.get(timeout=1)  # It may have reported just before exiting
+                        continue
+                    except Empty:
+                        error = f"process exited with code {process.exitcode}"
+                elif time.perf_counter() - started > RUN_TIMEOUT:
+                    process.kill()
+                    error = f"timed out after {RUN_TIMEOUT}s"
+                else:
+                    continue
+                result = {"converter": converter_name, "pdf": os.path.basename(pdf_path), "error": error,
+                          "wall_time": time.perf_counter() - started, "cpu_time": 0.0, "peak_rss_kb": 0}
+        process.join()
+        result["images_written"], result["bytes_written"] = _output_stats(work_dir)
+        return result
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_benchmark(converter_names, pdf_paths, repeat=1):
+    """Benchmark every converter on every PDF; timings are the median of `repeat` runs"""
+    runs = []
+    for converter_name in converter_names:
+        for pdf_path in pdf_paths:
+            samples = [run_once(converter_name, pdf_path) for _ in range(repeat)]
+            result = dict(samples[0])
+            for metric in ("wall_time", "cpu_time", "peak_rss_kb"):
+                result[metric] = statistics.median(sample[metric] for sample in samples)
+            if all("stages" in sample for sample in samples):
+                result["stages"] = {name: statistics.median(sample["stages"][name] for sample in samples)
+                                    for name in result["stages"]}
+            else:
+                result.pop("stages", None)
+            runs.append(result)
+            status = "❌" if result["error"] else "✅"
+            print(f"  {status} {converter_name:8} {result['pdf'][:60]:60} "
+                  f"{result['wall_time']*1000:8.1f} ms  {result['peak_rss_kb']/1024:6.1f} MB")
+    return runs
+
+
+def summarize(runs):
+    """Aggregate runs per converter"""
+    summary = {}
+    for run in runs:
+        totals = summary.setdefault(run["converter"], {
+            "documents": 0, "errors": 0, "wall_time": 0.0, "cpu_time": 0.0,
+            "peak_rss_kb": 0, "images_written": 0, "bytes_written": 0
+        })
+        totals["documents"] += 1
+        totals["errors"] += 1 if run["error"] else 0
+        totals["wall_time"] += run["wall_time"]
+        totals["cpu_time"] += run["cpu_time"]
+        totals["peak_rss_kb"] = max(totals["peak_rss_kb"], run["peak_rss_kb"])
+        totals["images_written"] += run["images_written"]
+        totals["bytes_written"] += run["bytes_written"]
+        for name, seconds in run.get("stages", {}).items():
+            stages = totals.setdefault("stages", {})
+            stages[name] = stages.get(name, 0.0) + seconds
+    return summary
+
+
+def compare_with_baseline(summary, baseline_summary, threshold):
+    """Return a list of regressions beyond threshold (0.2 = 20% slower/larger)
+
+    Any document that fails now but did not in the baseline is a regression
+    too; failing fast would otherwise look like a speedup.
+    """
+    regressions = []
+    for converter_name, totals in summary.items():
+        base = baseline_summary.get(converter_name)
+        if not base or base.get("documents") != totals["documents"]:
+            continue  # Different corpus; nothing meaningful to compare
+        if totals["errors"] > base.get("errors", 0):
+            regressions.append(f"{converter_name}.errors: {base.get('errors', 0)} -> {totals['errors']}")
+        for metric in GATED_METRICS:
+            if base.get(metric) and totals[metric] > base[metric] * (1 + threshold):
+                change = totals[metric] / base[metric] - 1
+                regressions.append(f"{converter_name}.{metric}: {base[metric]:.3f} -> {totals[metric]:.3f} (+{change:.0%})")
+    return regressions
+
+
+def main():
+    """Run the benchmark suite"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark the PDF converters')
+    parser.add_argument('--converters', default=','.join(CONVERTERS),
+                        help=f'Comma-separated converters to run (default: {",".join(CONVERTERS)})')
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS,
+                        help='Glob of additional PDFs (default: ../downloads/*.pdf); "" for none')
+    parser.add_argument('--limit', type=int, default=0, help='Only use the first N corpus PDFs')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per document; the median is kept')
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to save the results')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed regression vs. baseline before failing (default: 0.2 = 20%%)')
+
+    args = parser.parse_args()
+
+    converter_names = [name.strip() for name in args.converters.split(',') if name.strip()]
+    unknown = [name for name in converter_names if name not in CONVERTERS]
+    if unknown:
+        print(f"Error: unknown converters: {', '.join(unknown)}")
+        sys.exit(2)
+
+    pdf_paths = list(DEFAULT_PDFS)
+    if args.corpus:
+        corpus = sorted(glob.glob(args.corpus))
+        pdf_paths += corpus[:args.limit] if args.limit else corpus
+
+    print(f"\n{'='*60}")
+    print("Converter Benchmark")
+    print(f"{'='*60}")
+    print(f"{len(converter_names)} converters x {len(pdf_paths)} PDFs x {args.repeat} runs\n")
+
+    runs = run_benchmark(converter_names, pdf_paths, args.repeat)
+    summary = summarize(runs)
+
+    print(f"\n{'Converter':10} {'Docs':>5} {'Wall s':>8} {'CPU s':>8} {'Peak MB':>8} {'Images':>7} {'MB out':>8}")
+    for converter_name, totals in summary.items():
+        print(f"{converter_name:10} {totals['documents']:5} {totals['wall_time']:8.2f} {totals['cpu_time']:8.2f} "
+              f"{totals['peak_rss_kb']/1024:8.1f} {totals['images_written']:7} {totals['bytes_written']/1e6:8.1f}")
+        if totals.get("stages"):
+            print("           " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in totals["stages"].items()))
+
+    results = {
+        "timestamp": datetime.now().isoformat(),
+        "pdfs": [os.path.relpath(path, SCRIPT_DIR) for path in pdf_paths],
+        "repeat": args.repeat,
+        "summary": summary,
+        "runs": runs
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_with_baseline(summary, baseline.get("summary", {}), args.threshold)
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.threshold:.0%}:")
+            for regression in regressions:
+                print(f"   • {regression}")
+            sys.exit(1)
+        print(f"\n✅ No regressions beyond {args.threshold:.0%} vs. {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
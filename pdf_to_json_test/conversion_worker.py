@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Persistent Conversion Worker
+Long-lived PDFProcedureConverter process speaking JSON-RPC 2.0 over stdin/stdout,
+so callers pay interpreter start-up and PyMuPDF/PIL imports once instead of per PDF
+
+Protocol: one JSON object per line.
+    -> {"jsonrpc": "2.0", "id": 1, "method": "convert",
+        "params": {"pdf_path": "...", "output_dir": "...", "output_name": "...", "html": true}}
+    <- {"jsonrpc": "2.0", "id": 1, "result": {...}}
+Methods: convert, convert_data (base64 PDF in, procedure JSON out, nothing
+written to disk), ping, shutdown. On start-up the worker sends a "ready"
+notification; anything the converters print goes to stderr.
+"""
+
+import os
+import sys
+import json
+import base64
+import time
+import inspect
+from pathlib import Path
+from convert_procedure import generate_html
+from pdf_converter_robust import CONVERTER_VERSION, PDFProcedureConverter, convert_pdf_data
+from image_store import ImageStore
+from pdf_images import DEFAULT_PROFILE
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+CONVERSION_ERROR = -32000
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def convert_document(pdf_path, output_dir=None, output_name=None, html=True, passthrough=False, image_store=None,
+                     image_profile=DEFAULT_PROFILE):
+    """Convert one PDF; outputs are written to output_dir (default: next to the PDF)"""
+    if not pdf_path or not os.path.isfile(pdf_path):
+        raise RPCError(INVALID_PARAMS, f"PDF file not found: {pdf_path}")
+
+    pdf_path = os.path.abspath(pdf_path)
+    output_dir = os.path.abspath(output_dir or os.path.dirname(pdf_path))
+    output_name = output_name or Path(pdf_path).stem
+    if os.path.basename(output_name) != output_name:
+        raise RPCError(INVALID_PARAMS, f"output_name must be a plain file name: {output_name}")
+    store = ImageStore(os.path.abspath(image_store)) if image_store else None
+
+    # Image paths in the JSON/HTML are relative to the output directory
+    os.makedirs(output_dir, exist_ok=True)
+    os.chdir(output_dir)
+
+    start = time.perf_counter()
+    converter = PDFProcedureConverter(pdf_path, output_name, verbose=False,
+                                      passthrough=passthrough, image_store=store, image_profile=image_profile)
+    result = converter.convert()
+    html_file = generate_html(result.to_dict(), f"{output_name}.html") if html else ""
+
+    return {
+        'pdf_path': pdf_path,
+        'title': result.title,
+        'output_dir': output_dir,
+        'json_file': os.path.join(output_dir, result.json_file),
+        'html_file': os.path.join(output_dir, html_file) if html_file else "",
+        'report_file': os.path.join(output_dir, result.report_file),
+        'total_steps': len(result.steps),
+        'total_images': result.total_images,
+        'warnings': result.total_warnings,
+        'valid': result.validation.is_valid,
+        'avg_confidence': result.avg_confidence,
+        'metrics': result.metrics.to_dict(),
+        'elapsed': round(time.perf_counter() - start, 4)
+    }
+
+
+def convert_data_document(data, name="document.pdf", include_images=False, passthrough=False,
+                          image_profile=DEFAULT_PROFILE):
+    """Convert a base64-encoded PDF entirely in memory"""
+    try:
+        pdf_bytes = base64.b64decode(data, validate=True)
+    except (ValueError, TypeError) as e:
+        raise RPCError(INVALID_PARAMS, f"data must be base64: {e}")
+
+    start = time.perf_counter()
+    result = convert_pdf_data(pdf_bytes, name=name, passthrough=passthrough, image_profile=image_profile)
+    response = {
+        'title': result.title,
+        'procedure': result.to_dict(),
+        'total_steps': len(result.steps),
+        'total_images': result.total_images,
+        'warnings': result.total_warnings,
+        'valid': result.validation.is_valid,
+        'errors': result.validation.errors,
+        'avg_confidence': result.avg_confidence,
+        'elapsed': round(time.perf_counter() - start, 4)
+    }
+    if include_images:
+        # Encoding happens here, only when the caller asked for the images
+        response['images'] = {path: base64.b64encode(blob.data).decode('ascii')
+                              for path, blob in result.images.items()}
+    return response
+
+
+class ConversionWorker:
+    """Reads requests line by line and answers each as soon as it is done"""
+
+    def __init__(self, input_stream, output_stream, max_jobs=0):
+        self.input = input_stream
+        self.output = output_stream
+        self.max_jobs = max_jobs
+        self.jobs_done = 0
+        self.running = True
+        self.methods = {
+            'convert': self.convert,
+            'convert_data': self.convert_data,
+            'ping': self.ping,
+            'shutdown': self.shutdown,
+        }
+
+    def send(self, message):
+        self.output.write(json.dumps(message, ensure_ascii=False) + "\n")
+        self.output.flush()
+
+    def notify(self, method, params):
+        self.send({"jsonrpc": "2.0", "method": method, "params": params})
+
+    def convert(self, pdf_path, output_dir=None, output_name=None, html=True, passthrough=False, image_store=None,
+                image_profile=DEFAULT_PROFILE):
+        return convert_document(pdf_path, output_dir, output_name, html, passthrough, image_store, image_profile)
+
+    def convert_data(self, data, name="document.pdf", include_images=False, passthrough=False,
+                     image_profile=DEFAULT_PROFILE):
+        return convert_data_document(data, name, include_images, passthrough, image_profile)
+
+    def ping(self):
+        return {'pid': os.getpid(), 'jobs_done': self.jobs_done, 'converter_version': CONVERTER_VERSION}
+
+    def shutdown(self):
+        self.running = False
+        return {'jobs_done': self.jobs_done}
+
+    def handle(self, line):
+        """Answer one request line; notifications (no id) get no response"""
+        request_id = None
+        try:
+            try:
+                request = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise RPCError(PARSE_ERROR, f"Parse error: {e}")
+            if not isinstance(request, dict) or request.get('jsonrpc') != '2.0' or 'method' not in request:
+                raise RPCError(INVALID_REQUEST, "Invalid request")
+
+            request_id = request.get('id')
+            method = self.methods.get(request['method'])
+            if method is None:
+                raise RPCError(METHOD_NOT_FOUND, f"Method not found: {request['method']}")
+
+            # Failed jobs count too: the pool counts every convert response the same way
+            if request['method'] in ('convert', 'convert_data'):
+                self.jobs_done += 1
+
+            params = request.get('params') or {}
+            if not isinstance(params, dict):
+                raise RPCError(INVALID_PARAMS, "params must be an object")
+            try:
+                inspect.signature(method).bind(**params)
+            except TypeError as e:
+                raise RPCError(INVALID_PARAMS, str(e))
+            result = method(**params)
+
+            if request_id is not None:
+                self.send({"jsonrpc": "2.0", "id": request_id, "result": result})
+
+        except RPCError as e:
+            self.send({"jsonrpc": "2.0", "id": request_id, "error": {"code": e.code, "message": str(e)}})
+        except Exception as e:
+            self.send({"jsonrpc": "2.0", "id": request_id,
+                       "error": {"code": CONVERSION_ERROR, "message": f"{type(e).__name__}: {e}"}})
+
+    def serve(self):
+        self.notify('ready', {'pid': os.getpid(), 'converter_version': CONVERTER_VERSION})
+        for line in self.input:
+            if line.strip():
+                self.handle(line)
+            if not self.running:
+                break
+            # Recycle after max_jobs so leaks cannot accumulate; the pool starts a fresh worker
+            if self.max_jobs and self.jobs_done >= self.max_jobs:
+                self.notify('recycle', {'jobs_done': self.jobs_done})
+                break
+
+
+def main():
+    """Serve conversion requests on stdin/stdout"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Persistent PDF conversion worker (JSON-RPC over stdin/stdout)')
+    parser.add_argument('--max-jobs', type=int, default=0,
+                        help='Exit after this many conversions so the caller can recycle the worker (default: 0, never)')
+
+    args = parser.parse_args()
+
+    # stdout carries the protocol; send converter chatter to stderr instead
+    protocol_out = sys.stdout
+    sys.stdout = sys.stderr
+
+    ConversionWorker(sys.stdin, protocol_out, args.max_jobs).serve()
+
+
+if __name__ == "__main__":
+    main()
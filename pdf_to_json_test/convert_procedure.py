@@ -9,7 +9,11 @@ import sys
 import json
 import argparse
 from pathlib import Path
+from typing import Dict
 from pdf_converter_robust import PDFProcedureConverter
+from pdf_images import DEFAULT_PROFILE, ENCODER_PROFILES
+from image_store import ImageStore
+from image_derivatives import img_tag
 
 
 def generate_html_from_json(json_file: str, output_html: str = None) -> str:
@@ -20,6 +24,17 @@ def generate_html_from_json(json_file: str, output_html: str = None) -> str:
     if not output_html:
         output_html = json_file.replace('.json', '.html')
 
+    # Extract base name for report link
+    base_name = os.path.splitext(os.path.basename(json_file))[0]
+
+    return generate_html(data, output_html, f"{base_name}_report.html")
+
+
+def generate_html(data: Dict, output_html: str, report_href: str = None) -> str:
+    """Generate HTML from in-memory procedure data (as produced by ConversionResult.to_dict)"""
+    if not report_href:
+        report_href = f"{os.path.splitext(os.path.basename(output_html))[0]}_report.html"
+
     html_content = f"""<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -306,8 +321,7 @@ def generate_html_from_json(json_file: str, output_html: str = None) -> str:
             html_content += '                    <div class="step-images">\n'
             for image in step['images']:
                 html_content += f"""
-                        <img src="{image['path']}" alt="Step {step['step_number']}"
-                             class="step-image" onclick="openModal(this.src)">
+                        {img_tag(image, f"Step {step['step_number']}")}
 """
             html_content += '                    </div>\n'
 
@@ -315,14 +329,11 @@ def generate_html_from_json(json_file: str, output_html: str = None) -> str:
             </div>
 """
 
-    # Extract base name for report link
-    base_name = os.path.splitext(os.path.basename(json_file))[0]
-
     html_content += f"""
         </div>
 
         <div class="navigation">
-            <a href="{base_name}_report.html" class="nav-button">📊 View Validation Report</a>
+            <a href="{report_href}" class="nav-button">📊 View Validation Report</a>
             <a href="index.html" class="nav-button">📚 All Procedures</a>
         </div>
     </div>
@@ -371,6 +382,15 @@ def main():
     parser.add_argument('output_name', help='Base name for output files')
     parser.add_argument('--no-html', action='store_true', help='Skip HTML generation')
     parser.add_argument('--verbose', action='store_true', help='Verbose output')
+    parser.add_argument('--passthrough', action='store_true',
+                        help='Write embedded JPEG/PNG images as-is instead of re-encoding to PNG')
+    parser.add_argument('--image-store', metavar='DIR',
+                        help='Link images into a shared content-addressed store at DIR')
+    parser.add_argument('--image-profile', choices=list(ENCODER_PROFILES), default=DEFAULT_PROFILE,
+                        help='Image encoding: fast (quick PNG), compact (palette PNG), web (WebP) '
+                             f'(default: {DEFAULT_PROFILE})')
+    parser.add_argument('--derivatives', action='store_true',
+                        help='Also write thumbnail/medium image sizes and placeholders for the HTML page')
 
     args = parser.parse_args()
 
@@ -384,13 +404,17 @@ def main():
 
     # Step 1: Convert PDF to JSON with validation
     print("📄 Converting PDF to JSON...")
-    converter = PDFProcedureConverter(args.pdf_file, args.output_name, verbose=args.verbose)
-    json_file, report_file = converter.convert()
+    image_store = ImageStore(args.image_store) if args.image_store else None
+    converter = PDFProcedureConverter(args.pdf_file, args.output_name, verbose=args.verbose,
+                                      passthrough=args.passthrough, image_store=image_store,
+                                      image_profile=args.image_profile, derivatives=args.derivatives)
+    result = converter.convert()
+    json_file, report_file = result.json_file, result.report_file
 
     # Step 2: Generate HTML if requested
     if not args.no_html:
         print("🎨 Generating HTML...")
-        html_file = generate_html_from_json(json_file)
+        html_file = generate_html(result.to_dict(), f"{args.output_name}.html")
         print(f"   Created: {html_file}")
 
     # Step 3: Display results
@@ -405,22 +429,20 @@ def main():
         print(f"   • HTML:   {html_file}")
     print(f"   • Images: {args.output_name}_images/")
 
-    # Load and display validation summary
-    with open(json_file, 'r') as f:
-        data = json.load(f)
-
+    # Display validation summary
     print(f"\n📊 Conversion Summary:")
-    print(f"   • Title: {data['title']}")
-    print(f"   • Steps: {data['total_steps']}")
-    print(f"   • Images: {sum(len(s.get('images', [])) for s in data['steps'])}")
+    print(f"   • Title: {result.title}")
+    print(f"   • Steps: {len(result.steps)}")
+    print(f"   • Images: {result.total_images}")
+    stage_times = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in result.metrics.stages.items())
+    print(f"   • Time: {result.metrics.total_time:.2f}s ({stage_times})")
 
     # Check for warnings
-    total_warnings = sum(len(s.get('warnings', [])) for s in data['steps'])
-    if total_warnings > 0:
-        print(f"   • ⚠️  Warnings: {total_warnings} (see report for details)")
+    if result.total_warnings > 0:
+        print(f"   • ⚠️  Warnings: {result.total_warnings} (see report for details)")
 
     print(f"\n👉 Open {report_file} in a browser to view the detailed validation report")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -6,6 +6,7 @@ No metadata text above images
 
 import json
 import os
+from image_derivatives import img_tag
 
 
 def generate_clean_html(json_file: str, output_html: str = None) -> str:
@@ -227,8 +228,7 @@ def generate_clean_html(json_file: str, output_html: str = None) -> str:
         if step.get('images'):
             html_content += '                <div class="step-images">\n'
             for image in step['images']:
-                html_content += f"""                    <img src="{image['path']}" alt="Step {step['step_number']}"
-                         class="step-image" onclick="openModal(this.src)">
+                html_content += f"""                    {img_tag(image, f"Step {step['step_number']}")}
 """
             html_content += '                </div>\n'
 
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Responsive Image Derivatives
+Builds thumbnail and medium-width copies of step images and a tiny inline
+placeholder, so procedure pages do not download every full-size screenshot
+up front. A {stem}-derivatives.json sidecar records the source hash they
+were built from, so reconverting an unchanged image does not rebuild them.
+With an ImageStore they are also cached there by source hash and built
+once, however many documents use the same screenshot.
+"""
+
+import base64
+import hashlib
+import html
+import io
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+from PIL import Image
+from image_store import ImageStore
+from pdf_images import replace_file
+
+THUMBNAIL_WIDTH = 320
+MEDIUM_WIDTH = 960
+DERIVATIVE_WIDTHS = (THUMBNAIL_WIDTH, MEDIUM_WIDTH)
+
+# Inlined in the JSON as a data URI and shown blurred until the image loads
+PLACEHOLDER_WIDTH = 16
+
+DERIVATIVE_FORMAT = "WEBP"
+DERIVATIVE_EXT = "webp"
+DERIVATIVE_OPTIONS = {"quality": 80, "method": 4}
+
+# Step images are at most ~960px wide in every generated page
+IMAGE_SIZES = "(max-width: 1000px) 100vw, 960px"
+
+
+class DerivativeBuilder:
+    """Adds 'derivatives' and 'placeholder' to image entries of a converted procedure"""
+
+    def __init__(self, store: Optional[ImageStore] = None, widths=DERIVATIVE_WIDTHS):
+        self.store = store
+        self.widths = widths
+        self._done: Dict[str, Dict] = {}
+        self.built = 0
+        self.cached = 0
+
+    def add(self, entry: Dict, encoded: Optional[Dict[int, bytes]] = None) -> Dict:
+        """Build (or reuse) derivatives for one image entry and record them on it
+
+        encoded is the output of encode() for this image, when an earlier
+        stage already did the CPU work.
+        """
+        path = entry["path"]
+        if path not in self._done:
+            self._done[path] = self._build(path, entry.get("width"), encoded)
+        entry.update(self._done[path])
+        return entry
+
+    def add_all(self, image_lists: Iterable[List[Dict]],
+                encoded: Optional[Dict[str, Dict[int, bytes]]] = None) -> Dict[str, Exception]:
+        """Add derivatives to every entry; return {path: error} for images left as they were"""
+        encoded = encoded or {}
+        failures = {}
+        for images in image_lists:
+            for entry in images:
+                if entry["path"] in failures:
+                    continue
+                try:
+                    self.add(entry, encoded.get(entry["path"]))
+                except (OSError, ValueError) as e:
+                    failures[entry["path"]] = e
+        return failures
+
+    def encode(self, data: bytes) -> Dict[int, bytes]:
+        """Encoded derivatives of an image by width, placeholder included; CPU only, no I/O"""
+        image = _open(data)
+        widths = [width for width in sorted(self.widths) if width < image.width]
+        return {width: _resize(image, width) for width in widths + [PLACEHOLDER_WIDTH]}
+
+    def is_cached(self, path: str, data: bytes) -> bool:
+        """Whether derivatives for these image bytes already sit next to path"""
+        return _read_sidecar(path, hashlib.sha256(data).hexdigest()) is not None
+
+    def _build(self, path: str, source_width: Optional[int] = None,
+               encoded: Optional[Dict[int, bytes]] = None) -> Dict:
+        with open(path, 'rb') as f:
+            source = f.read()
+        source_hash = hashlib.sha256(source).hexdigest()
+
+        # Rebuilding the same image (a reconversion) reuses what the last run wrote
+        cached = _read_sidecar(path, source_hash)
+        if cached is not None:
+            self.cached += 1
+            return cached
+
+        if encoded is None and not source_width:
+            encoded = self.encode(source)
+        if encoded is not None:
+            widths = sorted(width for width in encoded if width != PLACEHOLDER_WIDTH)
+        else:
+            widths = [width for width in sorted(self.widths) if width < source_width]
+
+        stem = os.path.splitext(path)[0]
+        derivatives = []
+        placeholder = None
+        for width in widths + [PLACEHOLDER_WIDTH]:
+            stored = self.store.lookup_source(_source_key(source_hash, width)) if self.store else None
+            if stored is None:
+                if encoded is None:
+                    encoded = self.encode(source)
+                data = encoded[width]
+                self.built += 1
+                if self.store:
+                    stored = self.store.put(data, DERIVATIVE_EXT)
+                    self.store.record_source(_source_key(source_hash, width), stored[0], DERIVATIVE_EXT)
+            else:
+                self.cached += 1
+                data = None
+
+            derivative_path = f"{stem}-{width}w.{DERIVATIVE_EXT}"
+            if width == PLACEHOLDER_WIDTH:
+                if data is None:
+                    with open(stored[1], 'rb') as f:
+                        data = f.read()
+                placeholder = f"data:image/{DERIVATIVE_EXT};base64," + base64.b64encode(data).decode('ascii')
+                if stored is not None:
+                    # Only inlined in the JSON, but linked so the store's gc sees it is in use
+                    self.store.link(*stored, derivative_path)
+                continue
+
+            if stored is not None:
+                self.store.link(*stored, derivative_path)
+            else:
+                replace_file(derivative_path, data)
+            derivatives.append({"width": width, "path": derivative_path})
+
+        result = {"derivatives": derivatives, "placeholder": placeholder}
+        replace_file(_sidecar_path(path),
+                     json.dumps({"source_sha256": source_hash, **result}).encode('utf-8'))
+        return result
+
+
+def _sidecar_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}-derivatives.json"
+
+
+def _read_sidecar(path: str, source_hash: str) -> Optional[Dict]:
+    """What an earlier run built for this exact image, if its files are all still there"""
+    try:
+        with open(_sidecar_path(path), 'r', encoding='utf-8') as f:
+            sidecar = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if sidecar.get("source_sha256") != source_hash:
+        return None
+    if not all(os.path.exists(derivative["path"]) for derivative in sidecar.get("derivatives", [])):
+        return None
+    return {"derivatives": sidecar.get("derivatives", []), "placeholder": sidecar.get("placeholder")}
+
+
+def _resize(image: Image.Image, width: int) -> bytes:
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+    buffer = io.BytesIO()
+    resized.save(buffer, DERIVATIVE_FORMAT, **DERIVATIVE_OPTIONS)
+    return buffer.getvalue()
+
+
+def _source_key(source_hash: str, width: int) -> str:
+    return hashlib.sha256(f"{source_hash}:{width}w:{DERIVATIVE_EXT}".encode()).hexdigest()
+
+
+def _open(data: bytes) -> Image.Image:
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    return image if image.mode in ("RGB", "RGBA", "L") else image.convert("RGBA")
+
+
+def img_tag(image: Dict, alt: str, css_class: str = "step-image") -> str:
+    """<img> for a step image: responsive sources, intrinsic size, lazy loading
+
+    Entries without derivatives (older JSON) still get width/height and
+    loading="lazy". Clicking opens the full-size original in the modal.
+    """
+    path = html.escape(image["path"])
+    attrs = [f'alt="{html.escape(alt)}"', f'class="{css_class}"']
+
+    derivatives = image.get("derivatives") or []
+    if derivatives:
+        sources = [f"{html.escape(d['path'])} {d['width']}w" for d in derivatives]
+        if image.get("width"):
+            sources.append(f"{path} {image['width']}w")
+        attrs.insert(0, f'src="{html.escape(derivatives[-1]["path"])}"')
+        attrs.append(f'srcset="{", ".join(sources)}"')
+        attrs.append(f'sizes="{IMAGE_SIZES}"')
+    else:
+        attrs.insert(0, f'src="{path}"')
+
+    if image.get("width") and image.get("height"):
+        attrs.append(f'width="{image["width"]}" height="{image["height"]}"')
+    attrs.append('loading="lazy" decoding="async"')
+    if image.get("placeholder"):
+        attrs.append(f'style="background: url({image["placeholder"]}) center / cover no-repeat"')
+    attrs.append(f'data-full="{path}" onclick="openModal(this.dataset.full)"')
+
+    return f"<img {' '.join(attrs)}>"
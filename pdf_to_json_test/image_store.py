@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Image Store
+Keeps one copy of every image blob (keyed by SHA-256) and links per-document
+image directories into it, so identical logos and screenshots are stored once
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import sys
+from typing import Dict, Optional, Tuple
+
+
+class ImageStore:
+    """Blob store shared by all converters, documents and runs
+
+    Layout under root:
+        blobs/ab/abcdef....png   one file per distinct image content
+        sources/ab/abcdef...     maps a source stream + encoding to a blob
+        refs.jsonl               append-only log of (digest, linked path)
+    """
+
+    def __init__(self, root: str = "image_store"):
+        self.root = root
+        self.blobs_dir = os.path.join(root, "blobs")
+        self.sources_dir = os.path.join(root, "sources")
+        self.refs_path = os.path.join(root, "refs.jsonl")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.sources_dir, exist_ok=True)
+
+    def blob_path(self, digest: str, ext: str) -> str:
+        """Location of a blob in the store"""
+        return os.path.join(self.blobs_dir, digest[:2], f"{digest}.{ext}")
+
+    def put(self, data: bytes, ext: str) -> Tuple[str, str]:
+        """Store a blob unless it is already present; return (digest, blob path)"""
+        digest = hashlib.sha256(data).hexdigest()
+        blob_path = self.blob_path(digest, ext)
+
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+
+        return digest, blob_path
+
+    def lookup_source(self, source_key: str) -> Optional[Tuple[str, str]]:
+        """Find the blob previously produced from a source stream, if any"""
+        source_path = os.path.join(self.sources_dir, source_key[:2], source_key)
+        try:
+            with open(source_path, 'r') as f:
+                digest, ext = f.read().split()
+        except (OSError, ValueError):
+            return None
+
+        blob_path = self.blob_path(digest, ext)
+        if not os.path.exists(blob_path):
+            return None
+        return digest, blob_path
+
+    def record_source(self, source_key: str, digest: str, ext: str):
+        """Remember which blob a source stream was encoded to"""
+        source_path = os.path.join(self.sources_dir, source_key[:2], source_key)
+        os.makedirs(os.path.dirname(source_path), exist_ok=True)
+        tmp_path = f"{source_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(f"{digest} {ext}")
+        os.replace(tmp_path, source_path)
+
+    def link(self, digest: str, blob_path: str, dest_path: str):
+        """Expose a blob at dest_path (hardlink, else symlink, else copy) and count the reference"""
+        if not (os.path.exists(dest_path) and os.path.samefile(dest_path, blob_path)):
+            tmp_path = f"{dest_path}.{os.getpid()}.tmp"
+            try:
+                os.link(blob_path, tmp_path)
+            except OSError:
+                try:
+                    os.symlink(os.path.abspath(blob_path), tmp_path)
+                except OSError:
+                    shutil.copyfile(blob_path, tmp_path)
+            os.replace(tmp_path, dest_path)
+
+        self._add_ref(digest, dest_path)
+
+    def _add_ref(self, digest: str, dest_path: str):
+        """Append a reference; single short appends are safe across processes"""
+        line = json.dumps({"digest": digest, "path": os.path.abspath(dest_path)}) + "\n"
+        with open(self.refs_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+    def _load_refs(self) -> Dict[str, set]:
+        """Read the reference log into digest -> set of paths"""
+        refs: Dict[str, set] = {}
+        if not os.path.exists(self.refs_path):
+            return refs
+        with open(self.refs_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # Torn write from an interrupted run
+                refs.setdefault(entry["digest"], set()).add(entry["path"])
+        return refs
+
+    def _iter_blobs(self):
+        """Yield (digest, blob path) for every blob in the store"""
+        for dirpath, _dirnames, filenames in os.walk(self.blobs_dir):
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                yield filename.split(".", 1)[0], os.path.join(dirpath, filename)
+
+    def gc(self, dry_run: bool = False) -> Dict:
+        """Drop references whose files are gone or replaced, then delete unreferenced blobs
+
+        Source-index entries pointing at a deleted blob are removed with it,
+        so the index never claims a conversion is cached when it is not.
+        """
+        refs = self._load_refs()
+        live_refs = {}
+        removed_blobs = 0
+        freed_bytes = 0
+        removed_digests = set()
+
+        for digest, blob_path in self._iter_blobs():
+            live = {path for path in refs.get(digest, set())
+                    if os.path.exists(path) and os.path.samefile(path, blob_path)}
+
+            # A copied (not linked) file still counts if its content matches
+            live |= {path for path in refs.get(digest, set()) - live
+                     if os.path.exists(path) and _file_digest(path) == digest}
+
+            if live:
+                live_refs[digest] = live
+            else:
+                removed_blobs += 1
+                removed_digests.add(digest)
+                freed_bytes += os.path.getsize(blob_path)
+                if not dry_run:
+                    os.remove(blob_path)
+
+        if not dry_run:
+            tmp_path = f"{self.refs_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                for digest, paths in sorted(live_refs.items()):
+                    for path in sorted(paths):
+                        f.write(json.dumps({"digest": digest, "path": path}) + "\n")
+            os.replace(tmp_path, self.refs_path)
+
+        removed_sources = 0
+        for dirpath, _dirnames, filenames in os.walk(self.sources_dir):
+            for filename in filenames:
+                source_path = os.path.join(dirpath, filename)
+                try:
+                    with open(source_path, 'r') as f:
+                        digest = f.read().split()[0]
+                except (OSError, IndexError):
+                    continue
+                if digest in removed_digests:
+                    removed_sources += 1
+                    if not dry_run:
+                        os.remove(source_path)
+
+        return {
+            "blobs_kept": len(live_refs),
+            "blobs_removed": removed_blobs,
+            "bytes_freed": freed_bytes,
+            "references": sum(len(paths) for paths in live_refs.values()),
+            "sources_removed": removed_sources
+        }
+
+    def import_directory(self, directory: str) -> Dict:
+        """Move the images of existing *_images directories into the store and link them back"""
+        imported = 0
+        saved_bytes = 0
+
+        for dirpath, _dirnames, filenames in os.walk(directory):
+            if not dirpath.endswith("_images") or os.path.abspath(dirpath).startswith(os.path.abspath(self.root)):
+                continue
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                ext = os.path.splitext(filename)[1].lstrip(".")
+                if os.path.islink(path) or not ext:
+                    continue
+
+                with open(path, 'rb') as f:
+                    data = f.read()
+                digest = hashlib.sha256(data).hexdigest()
+                already_stored = os.path.exists(self.blob_path(digest, ext))
+                digest, blob_path = self.put(data, ext)
+                if not os.path.samefile(path, blob_path):
+                    if already_stored:
+                        saved_bytes += len(data)
+                    self.link(digest, blob_path, path)
+                    imported += 1
+
+        return {"files_imported": imported, "bytes_deduplicated": saved_bytes}
+
+
+def _file_digest(path: str) -> str:
+    """SHA-256 of a file on disk"""
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def main():
+    """Command line maintenance for the image store"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Manage the content-addressed image store')
+    parser.add_argument('--root', default='image_store', help='Store directory (default: image_store)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    gc_parser = subparsers.add_parser('gc', help='Delete blobs that no document references any more')
+    gc_parser.add_argument('--dry-run', action='store_true', help='Report what would be deleted')
+
+    import_parser = subparsers.add_parser('import', help='Deduplicate existing *_images directories into the store')
+    import_parser.add_argument('directories', nargs='+', help='Directories to scan')
+
+    args = parser.parse_args()
+    store = ImageStore(args.root)
+
+    if args.command == 'gc':
+        stats = store.gc(dry_run=args.dry_run)
+        print(f"Blobs kept: {stats['blobs_kept']} ({stats['references']} references)")
+        print(f"Blobs removed: {stats['blobs_removed']} ({stats['bytes_freed']:,} bytes freed, "
+              f"{stats['sources_removed']} source entries)")
+    elif args.command == 'import':
+        for directory in args.directories:
+            if not os.path.isdir(directory):
+                print(f"Error: '{directory}' is not a directory")
+                sys.exit(1)
+            stats = store.import_directory(directory)
+            print(f"{directory}: {stats['files_imported']} files linked, "
+                  f"{stats['bytes_deduplicated']:,} duplicate bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,468 @@
+#!/usr/bin/env python3
+"""
+Durable Conversion Job Queue
+SQLite-backed queue with priority classes, leased jobs kept alive by heartbeats,
+exponential-backoff retries and a dead-letter state, shared by any number of
+worker processes on the same machine
+"""
+
+import os
+import sys
+import json
+import time
+import inspect
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+QUEUE_FILE = 'job_queue.db'
+
+# Lower value runs first; interactive work jumps any batch backlog
+PRIORITIES = {
+    "interactive": 0,
+    "default": 50,
+    "batch": 100,
+}
+
+LEASE_SECONDS = 60
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 600.0
+MAX_ATTEMPTS = 5
+
+# Keyword arguments of conversion_worker.convert_document, which every job is
+# run with; listed here so enqueueing does not import the converter
+JOB_PARAMS = ("pdf_path", "output_dir", "output_name", "html", "passthrough", "image_store", "image_profile")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    params TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, priority, available_at, id);
+"""
+
+
+@dataclass
+class Job:
+    """One conversion request; params are passed to conversion_worker.convert_document"""
+    id: int
+    params: Dict
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    available_at: float
+    lease_owner: Optional[str] = None
+    lease_expires: Optional[float] = None
+    last_error: Optional[str] = None
+    result: Optional[Dict] = None
+
+    @classmethod
+    def from_row(cls, row) -> "Job":
+        return cls(
+            id=row["id"],
+            params=json.loads(row["params"]),
+            priority=row["priority"],
+            status=row["status"],
+            attempts=row["attempts"],
+            max_attempts=row["max_attempts"],
+            available_at=row["available_at"],
+            lease_owner=row["lease_owner"],
+            lease_expires=row["lease_expires"],
+            last_error=row["last_error"],
+            result=json.loads(row["result"]) if row["result"] else None
+        )
+
+    def to_dict(self) -> Dict:
+        priority_name = next((name for name, value in PRIORITIES.items() if value == self.priority), str(self.priority))
+        return {
+            "id": self.id,
+            "params": self.params,
+            "priority": priority_name,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "last_error": self.last_error,
+            "result": self.result
+        }
+
+
+def backoff_delay(attempts: int) -> float:
+    """Seconds to wait before retry number `attempts`, doubling each time, with jitter"""
+    delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(0, attempts - 1))
+    return delay + random.uniform(0, delay * 0.1)
+
+
+class JobQueue:
+    """Queue operations; every call uses its own short transaction, so it is safe across processes"""
+
+    def __init__(self, path: str = QUEUE_FILE, lease_seconds: float = LEASE_SECONDS):
+        self.path = os.path.abspath(path)
+        self.lease_seconds = lease_seconds
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        db.execute("PRAGMA journal_mode=WAL")
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Write transaction taken up front, so two workers can never lease the same job"""
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+                db.execute("COMMIT")
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, params: Dict, priority: str = "default", max_attempts: int = MAX_ATTEMPTS,
+                delay: float = 0) -> int:
+        """Add a job and return its id"""
+        unknown = sorted(set(params) - set(JOB_PARAMS))
+        if unknown:
+            raise ValueError(f"Unknown params {', '.join(unknown)} (expected some of {', '.join(JOB_PARAMS)})")
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}' (expected one of {', '.join(PRIORITIES)})")
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "INSERT INTO jobs (params, priority, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (json.dumps(params), PRIORITIES[priority], max_attempts, now + delay, now, now))
+            return cursor.lastrowid
+
+    def lease(self, worker_id: str, max_priority: Optional[str] = None) -> Optional[Job]:
+        """Claim the most urgent ready job for lease_seconds; None if nothing is ready
+
+        max_priority restricts a worker to urgent classes, e.g. "interactive"
+        for a worker kept free of batch work.
+        """
+        now = time.time()
+        priority_limit = PRIORITIES[max_priority] if max_priority else max(PRIORITIES.values())
+        with self._transaction() as db:
+            self._reclaim_expired(db, now)
+            row = db.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' AND available_at <= ? AND priority <= ? "
+                "ORDER BY priority, available_at, id LIMIT 1",
+                (now, priority_limit)).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE jobs SET status = 'leased', attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires = ?, updated_at = ? WHERE id = ?",
+                (worker_id, now + self.lease_seconds, now, row["id"]))
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return Job.from_row(row)
+
+    def _reclaim_expired(self, db, now: float):
+        """Jobs whose worker stopped heartbeating are retried (or dead-lettered) like failures"""
+        expired = db.execute(
+            "SELECT id, attempts, max_attempts, lease_owner FROM jobs WHERE status = 'leased' AND lease_expires < ?",
+            (now,)).fetchall()
+        for row in expired:
+            self._record_failure(db, row["id"], row["attempts"], row["max_attempts"],
+                                 f"Lease expired (worker {row['lease_owner']} stopped responding)", now)
+
+    def _record_failure(self, db, job_id: int, attempts: int, max_attempts: int, error: str, now: float,
+                        retry: bool = True):
+        if not retry or attempts >= max_attempts:
+            db.execute(
+                "UPDATE jobs SET status = 'dead', lease_owner = NULL, lease_expires = NULL, last_error = ?, "
+                "updated_at = ? WHERE id = ?", (error, now, job_id))
+        else:
+            db.execute(
+                "UPDATE jobs SET status = 'queued', lease_owner = NULL, lease_expires = NULL, last_error = ?, "
+                "available_at = ?, updated_at = ? WHERE id = ?",
+                (error, now + backoff_delay(attempts), now, job_id))
+
+    def heartbeat(self, job_id: int, worker_id: str) -> bool:
+        """Extend a lease; False means the lease was lost and the job may run elsewhere"""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (now + self.lease_seconds, now, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker_id: str, result: Dict) -> bool:
+        """Mark a leased job done; ignored (False) if the lease was lost meanwhile"""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (json.dumps(result), now, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker_id: str, error: str, retry: bool = True) -> bool:
+        """Schedule a retry with backoff, or dead-letter the job once attempts run out (or right away, without retry)"""
+        now = time.time()
+        with self._transaction() as db:
+            row = db.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND status = 'leased' AND lease_owner = ?",
+                (job_id, worker_id)).fetchone()
+            if row is None:
+                return False
+            self._record_failure(db, job_id, row["attempts"], row["max_attempts"], error, now, retry)
+            return True
+
+    def retry(self, job_id: int) -> bool:
+        """Put a dead-lettered job back in the queue with a fresh set of attempts"""
+        now = time.time()
+        with self._transaction() as db:
+            cursor = db.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ?, updated_at = ? "
+                "WHERE id = ? AND status = 'dead'", (now, now, job_id))
+            return cursor.rowcount == 1
+
+    def get(self, job_id: int) -> Optional[Job]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def jobs(self, status: Optional[str] = None, limit: int = 100) -> List[Job]:
+        with self._connect() as db:
+            if status:
+                rows = db.execute("SELECT * FROM jobs WHERE status = ? ORDER BY priority, id LIMIT ?",
+                                  (status, limit)).fetchall()
+            else:
+                rows = db.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+        return [Job.from_row(row) for row in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Job counts per status"""
+        with self._connect() as db:
+            rows = db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {status: 0 for status in ("queued", "leased", "done", "dead")}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+class Heartbeat:
+    """Background thread that keeps a job's lease alive while it is being converted"""
+
+    def __init__(self, queue: JobQueue, job_id: int, worker_id: str):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.queue.lease_seconds / 3):
+            if not self.queue.heartbeat(self.job_id, self.worker_id):
+                self.lost = True
+                return
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue: JobQueue, worker_id: str, max_priority: Optional[str] = None,
+               poll_interval: float = 1.0, once: bool = False):
+    """Lease and convert jobs until interrupted (or the queue is empty, with once)"""
+    # Imported here so enqueueing clients do not pay for PyMuPDF/PIL
+    import fitz
+    from conversion_worker import INVALID_PARAMS, RPCError, convert_document
+
+    def is_permanent(error: Exception) -> bool:
+        """Failures another attempt cannot fix: the PDF is missing or unreadable, or the params are invalid"""
+        if isinstance(error, RPCError):
+            return error.code == INVALID_PARAMS
+        return isinstance(error, (FileNotFoundError, fitz.FileDataError))
+
+    signature = inspect.signature(convert_document)
+
+    print(f"👷 Worker {worker_id} polling {queue.path}")
+    while True:
+        job = queue.lease(worker_id, max_priority)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        print(f"▶️  Job {job.id} (attempt {job.attempts}/{job.max_attempts}): {job.params.get('pdf_path')}")
+        try:
+            # Jobs queued before a params change (or by an older client) cannot succeed on retry
+            signature.bind(**job.params)
+        except TypeError as e:
+            error = f"Invalid params: {e}"
+            queue.fail(job.id, worker_id, error, retry=False)
+            print(f"❌ Job {job.id} failed permanently: {error}")
+            continue
+
+        try:
+            with Heartbeat(queue, job.id, worker_id):
+                result = convert_document(**job.params)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            permanent = is_permanent(e)
+            queue.fail(job.id, worker_id, error, retry=not permanent)
+            print(f"❌ Job {job.id} failed{' permanently' if permanent else ''}: {error}")
+            continue
+
+        if queue.complete(job.id, worker_id, result):
+            print(f"✅ Job {job.id} done: {result['title']}")
+        else:
+            print(f"⚠️  Job {job.id} finished after its lease was lost; result discarded")
+
+
+def serve_http(queue: JobQueue, host: str = '127.0.0.1', port: int = 8765):
+    """Minimal local HTTP front end: POST /jobs, GET /jobs/<id>, GET /stats"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            data = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != '/jobs':
+                return self._reply(404, {"error": "Not found"})
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+                params = body.get("params")
+                if not isinstance(params, dict) or not params.get("pdf_path"):
+                    raise ValueError("params.pdf_path is required")
+                job_id = queue.enqueue(params, body.get("priority", "default"),
+                                       body.get("max_attempts", MAX_ATTEMPTS))
+            except (ValueError, TypeError, AttributeError) as e:
+                return self._reply(400, {"error": str(e)})
+            self._reply(201, {"id": job_id})
+
+        def do_GET(self):
+            if self.path == '/stats':
+                return self._reply(200, queue.stats())
+            if self.path.startswith('/jobs/'):
+                job = queue.get(int(self.path.rsplit('/', 1)[1])) if self.path.rsplit('/', 1)[1].isdigit() else None
+                if job:
+                    return self._reply(200, job.to_dict())
+            self._reply(404, {"error": "Not found"})
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    print(f"📮 Job queue listening on http://{host}:{port}")
+    server.serve_forever()
+
+
+def main():
+    """Command line interface to the job queue"""
+    import argparse
+    import glob
+    import socket
+
+    parser = argparse.ArgumentParser(description='Durable conversion job queue')
+    parser.add_argument('--db', default=QUEUE_FILE, help=f'Queue database (default: {QUEUE_FILE})')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    enqueue_parser = subparsers.add_parser('enqueue', help='Queue PDFs for conversion')
+    enqueue_parser.add_argument('pdfs', nargs='+', help='PDF files or glob patterns')
+    enqueue_parser.add_argument('--priority', choices=PRIORITIES, default='default')
+    enqueue_parser.add_argument('--output-dir', help='Where to write outputs (default: next to each PDF)')
+    enqueue_parser.add_argument('--no-html', action='store_true', help='Skip HTML generation')
+    enqueue_parser.add_argument('--passthrough', action='store_true',
+                                help='Write embedded JPEG/PNG images as-is instead of re-encoding to PNG')
+    enqueue_parser.add_argument('--image-store', metavar='DIR',
+                                help='Link images into a shared content-addressed store at DIR')
+    enqueue_parser.add_argument('--max-attempts', type=int, default=MAX_ATTEMPTS)
+
+    worker_parser = subparsers.add_parser('worker', help='Convert queued jobs')
+    worker_parser.add_argument('--id', help='Worker name (default: host:pid)')
+    worker_parser.add_argument('--only', choices=PRIORITIES, metavar='PRIORITY',
+                               help='Only take jobs at least this urgent, e.g. interactive')
+    worker_parser.add_argument('--lease', type=float, default=LEASE_SECONDS, help='Lease length in seconds')
+    worker_parser.add_argument('--once', action='store_true', help='Exit when no job is ready')
+
+    status_parser = subparsers.add_parser('status', help='Show queue counts and jobs')
+    status_parser.add_argument('--state', choices=('queued', 'leased', 'done', 'dead'),
+                               help='List jobs in this state')
+
+    retry_parser = subparsers.add_parser('retry', help='Requeue dead-lettered jobs')
+    retry_parser.add_argument('job_ids', nargs='+', type=int)
+
+    serve_parser = subparsers.add_parser('serve', help='Accept jobs over HTTP')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+
+    args = parser.parse_args()
+    queue = JobQueue(args.db, lease_seconds=getattr(args, 'lease', LEASE_SECONDS))
+
+    if args.command == 'enqueue':
+        pdf_files = [path for pattern in args.pdfs for path in (sorted(glob.glob(pattern)) or [pattern])]
+        for pdf_file in pdf_files:
+            if not os.path.isfile(pdf_file):
+                print(f"Error: PDF file '{pdf_file}' not found")
+                sys.exit(1)
+        for pdf_file in pdf_files:
+            params = {
+                "pdf_path": os.path.abspath(pdf_file),
+                "output_dir": os.path.abspath(args.output_dir) if args.output_dir else None,
+                "html": not args.no_html,
+                "passthrough": args.passthrough,
+                "image_store": os.path.abspath(args.image_store) if args.image_store else None
+            }
+            job_id = queue.enqueue(params, args.priority, args.max_attempts)
+            print(f"📥 Job {job_id} [{args.priority}]: {pdf_file}")
+
+    elif args.command == 'worker':
+        worker_id = args.id or f"{socket.gethostname()}:{os.getpid()}"
+        try:
+            run_worker(queue, worker_id, args.only, once=args.once)
+        except KeyboardInterrupt:
+            print(f"\n👋 Worker {worker_id} stopped")
+
+    elif args.command == 'status':
+        print("  ".join(f"{status}: {count}" for status, count in queue.stats().items()))
+        if args.state:
+            for job in queue.jobs(args.state):
+                info = job.to_dict()
+                print(f"  #{job.id:<6} {info['priority']:12} attempts {job.attempts}/{job.max_attempts}  "
+                      f"{job.params.get('pdf_path')}" + (f"\n          {job.last_error}" if job.last_error else ""))
+
+    elif args.command == 'retry':
+        for job_id in args.job_ids:
+            print(f"{'🔁 Requeued' if queue.retry(job_id) else '⚠️  Not dead-lettered:'} job {job_id}")
+
+    elif args.command == 'serve':
+        serve_http(queue, args.host, args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import json
 import os
 from pathlib import Path
+from image_derivatives import img_tag
 
 def create_procedure_html(json_file, output_html):
     with open(json_file, 'r') as f:
@@ -216,8 +217,7 @@ def create_procedure_html(json_file, output_html):
 
         for image in step['images']:
             html_content += f"""
-                    <img src="{image['path']}" alt="Step {step['step_number']} - {image['filename']}"
-                         class="step-image" onclick="openModal(this.src)">
+                    {img_tag(image, f"Step {step['step_number']} - {image['filename']}")}
 """
 
         html_content += """
@@ -11,15 +11,22 @@ import re
 from PIL import Image
 import io
 from typing import Dict, List, Tuple, Optional
+from image_derivatives import DerivativeBuilder
+from pdf_images import ImageInfo, ImageWriter, drop_images, get_image_infos, is_logo_size
+from image_store import ImageStore
 
 
 class FixedPDFConverter:
     """PDF converter with proper logo filtering and step association"""
 
-    def __init__(self, pdf_path: str, output_name: str, verbose: bool = False):
+    def __init__(self, pdf_path: str, output_name: str, verbose: bool = False,
+                 passthrough: bool = False, image_store: Optional[ImageStore] = None, derivatives: bool = False):
         self.pdf_path = pdf_path
         self.output_name = output_name
         self.verbose = verbose
+        self.passthrough = passthrough
+        self.image_store = image_store
+        self.derivatives = derivatives
         self.doc = None
 
     def log(self, message: str):
@@ -27,28 +34,17 @@ class FixedPDFConverter:
         if self.verbose:
             print(f"[INFO] {message}")
 
-    def is_logo_image(self, image: Image.Image, page_num: int, img_index: int) -> bool:
-        """Determine if an image is likely a logo"""
+    def is_logo_image(self, info: ImageInfo, page_num: int) -> bool:
+        """Determine from xref metadata whether an image is likely a logo"""
         # Logo characteristics:
         # 1. Small to medium size (typically < 400px in either dimension)
         # 2. Often square-ish aspect ratio
         # 3. Usually appears at the same position on multiple pages
         # 4. Common size is 258x395 based on analysis
-
-        width, height = image.width, image.height
-
-        # Check for specific known logo size
-        if width == 258 and height == 395:
-            self.log(f"Detected logo on page {page_num} (258x395)")
+        if is_logo_size(info.width, info.height):
+            self.log(f"Detected likely logo on page {page_num} ({info.width}x{info.height})")
             return True
 
-        # General logo detection
-        if width < 400 and height < 400:
-            aspect_ratio = width / height if height > 0 else 0
-            if 0.4 < aspect_ratio < 0.8:  # Portrait logo
-                self.log(f"Detected likely logo on page {page_num} ({width}x{height})")
-                return True
-
         return False
 
     def extract_steps_properly(self) -> List[Dict]:
@@ -152,6 +148,7 @@ class FixedPDFConverter:
         self.doc = fitz.open(self.pdf_path)
         images_dir = f"{self.output_name}_images"
         os.makedirs(images_dir, exist_ok=True)
+        writer = ImageWriter(self.doc, images_dir, self.passthrough, self.image_store)
 
         # Build page-to-steps mapping
         page_steps = {}
@@ -166,62 +163,38 @@ class FixedPDFConverter:
             if page_num not in page_steps:
                 continue
 
-            image_list = page.get_images(full=True)
-            valid_images = []
-
-            # First pass: extract and filter images
-            for img_index, img in enumerate(image_list):
-                try:
-                    xref = img[0]
-                    base_image = self.doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image = Image.open(io.BytesIO(image_bytes))
-
-                    # Skip logos
-                    if self.is_logo_image(image, page_num, img_index):
-                        continue
-
-                    # Skip very small images
-                    if image.width < 100 or image.height < 100:
-                        continue
-
-                    valid_images.append({
-                        'image': image,
-                        'index': img_index + 1,
-                        'width': image.width,
-                        'height': image.height
-                    })
-
-                except Exception as e:
-                    self.log(f"Failed to extract image {img_index} from page {page_num}: {e}")
+            # First pass: filter images from metadata; nothing is extracted yet
+            valid_images = [info for info in get_image_infos(page)
+                            if not self.is_logo_image(info, page_num)     # Skip logos
+                            and info.width >= 100 and info.height >= 100]  # Skip very small images
 
             # Second pass: assign images to steps
             if valid_images:
                 steps_on_page = page_steps[page_num]
 
+                # The main screenshot is usually the largest image on the page
+                main_img = max(valid_images, key=lambda info: info.area)
+
                 # Strategy: Main screenshot goes to each step
-                # If multiple steps on a page, they likely share the same screenshot
+                # If multiple steps on a page, they likely share the same screenshot,
+                # which is written once and referenced by every step
                 for step in steps_on_page:
                     step['images'] = []
 
-                    # Add the main screenshot (usually the largest) to each step
-                    if valid_images:
-                        # Sort by size to get the main screenshot first
-                        valid_images.sort(key=lambda x: x['width'] * x['height'], reverse=True)
+                    try:
+                        step['images'].append(writer.save(main_img))
+                    except Exception as e:
+                        self.log(f"Failed to extract image {main_img.index} from page {page_num}: {e}")
 
-                        # Save the main screenshot for this step
-                        main_img = valid_images[0]
-                        image_filename = f"step_{step['step_number']}_page_{page_num}.png"
-                        image_path = os.path.join(images_dir, image_filename)
+        failures = writer.close()
+        for path, error in failures.items():
+            self.log(f"Failed to write image {path}: {error}")
+        drop_images((step.get('images', []) for step in steps), failures)
 
-                        main_img['image'].save(image_path, "PNG")
-
-                        step['images'].append({
-                            "filename": image_filename,
-                            "path": image_path,
-                            "width": main_img['width'],
-                            "height": main_img['height']
-                        })
+        if self.derivatives:
+            failures = DerivativeBuilder(self.image_store).add_all(step.get('images', []) for step in steps)
+            for path, error in failures.items():
+                self.log(f"No derivatives for {path}: {error}")
 
         self.doc.close()
         return steps
@@ -318,18 +291,25 @@ class FixedPDFConverter:
 
 def test_converter():
     """Test the converter on both PDFs"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert the sample PDFs with the fixed converter')
+    parser.add_argument('--derivatives', action='store_true',
+                        help='Also write thumbnail/medium image sizes and placeholders for the HTML page')
+    args = parser.parse_args()
+
     print("\n" + "="*60)
     print("Testing Fixed PDF Converter")
     print("="*60)
 
     # Test 3CX
-    converter1 = FixedPDFConverter("3cx_forwarding.pdf", "3cx_corrected", verbose=True)
+    converter1 = FixedPDFConverter("3cx_forwarding.pdf", "3cx_corrected", verbose=True, derivatives=args.derivatives)
     json1 = converter1.convert()
 
     print()
 
     # Test Twilio
-    converter2 = FixedPDFConverter("twilio_logs.pdf", "twilio_corrected", verbose=True)
+    converter2 = FixedPDFConverter("twilio_logs.pdf", "twilio_corrected", verbose=True, derivatives=args.derivatives)
     json2 = converter2.convert()
 
     print("\n" + "="*60)
@@ -11,36 +11,31 @@ import re
 from PIL import Image
 import io
 from typing import Dict, List, Tuple, Optional
+from image_derivatives import DerivativeBuilder
+from pdf_images import ImageInfo, ImageWriter, drop_images, get_image_infos, is_logo_size
+from image_store import ImageStore
 
 
 class PerfectPDFConverter:
     """Final PDF converter with all issues resolved"""
 
-    def __init__(self, pdf_path: str, output_name: str, verbose: bool = False):
+    def __init__(self, pdf_path: str, output_name: str, verbose: bool = False,
+                 passthrough: bool = False, image_store: Optional[ImageStore] = None, derivatives: bool = False):
         self.pdf_path = pdf_path
         self.output_name = output_name
         self.verbose = verbose
+        self.passthrough = passthrough
+        self.image_store = image_store
+        self.derivatives = derivatives
 
     def log(self, message: str):
         """Log message if verbose"""
         if self.verbose:
             print(f"[INFO] {message}")
 
-    def is_logo_image(self, image: Image.Image) -> bool:
-        """Determine if an image is likely a logo"""
-        width, height = image.width, image.height
-
-        # Known logo size from analysis
-        if width == 258 and height == 395:
-            return True
-
-        # General logo detection - small square-ish images
-        if width < 400 and height < 400:
-            aspect_ratio = width / height if height > 0 else 0
-            if 0.4 < aspect_ratio < 0.8:  # Portrait orientation logos
-                return True
-
-        return False
+    def is_logo_image(self, info: ImageInfo) -> bool:
+        """Determine from xref metadata whether an image is likely a logo"""
+        return is_logo_size(info.width, info.height)
 
     def extract_structured_data(self) -> Dict:
         """Extract all data with perfect step-image association"""
@@ -71,39 +66,21 @@ class PerfectPDFConverter:
         images_dir = f"{self.output_name}_images"
         os.makedirs(images_dir, exist_ok=True)
 
+        writer = ImageWriter(doc, images_dir, self.passthrough, self.image_store)
         page_screenshots = {}
 
-        # Extract main screenshot from each page (excluding logos)
+        # Pick the main screenshot of each page (excluding logos) from metadata
         for page_num, page in enumerate(doc, 1):
-            image_list = page.get_images(full=True)
-            main_screenshot = None
-
-            for img_index, img in enumerate(image_list):
-                try:
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image = Image.open(io.BytesIO(image_bytes))
-
-                    # Skip logos
-                    if self.is_logo_image(image):
-                        self.log(f"Skipped logo on page {page_num}: {image.width}x{image.height}")
-                        continue
-
-                    # This is likely the main screenshot
-                    if image.width > 500 and image.height > 300:
-                        main_screenshot = {
-                            'image': image,
-                            'width': image.width,
-                            'height': image.height
-                        }
-                        break
-
-                except Exception as e:
-                    self.log(f"Error extracting image {img_index} from page {page_num}: {e}")
+            for info in get_image_infos(page):
+                # Skip logos
+                if self.is_logo_image(info):
+                    self.log(f"Skipped logo on page {page_num}: {info.width}x{info.height}")
+                    continue
 
-            if main_screenshot:
-                page_screenshots[page_num] = main_screenshot
+                # This is likely the main screenshot
+                if info.width > 500 and info.height > 300:
+                    page_screenshots[page_num] = info
+                    break
 
         # Associate steps with their pages and images
         step_page_mapping = {
@@ -129,21 +106,25 @@ class PerfectPDFConverter:
             }
 
             # Add screenshot if available for this page
+            # Steps on the same page share one written file
             if page_num in page_screenshots:
                 screenshot = page_screenshots[page_num]
-                image_filename = f"step_{step_num}_page_{page_num}.png"
-                image_path = os.path.join(images_dir, image_filename)
+                try:
+                    step_data["images"].append(writer.save(screenshot))
+                except Exception as e:
+                    self.log(f"Error extracting image {screenshot.index} from page {page_num}: {e}")
 
-                screenshot['image'].save(image_path, "PNG")
+            final_steps.append(step_data)
 
-                step_data["images"].append({
-                    "filename": image_filename,
-                    "path": image_path,
-                    "width": screenshot['width'],
-                    "height": screenshot['height']
-                })
+        failures = writer.close()
+        for path, error in failures.items():
+            self.log(f"Error writing image {path}: {error}")
+        drop_images((step["images"] for step in final_steps), failures)
 
-            final_steps.append(step_data)
+        if self.derivatives:
+            failures = DerivativeBuilder(self.image_store).add_all(step["images"] for step in final_steps)
+            for path, error in failures.items():
+                self.log(f"No derivatives for {path}: {error}")
 
         doc.close()
 
@@ -174,16 +155,23 @@ class PerfectPDFConverter:
 
 def main():
     """Test the perfect converter"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert the sample PDFs with the perfect converter')
+    parser.add_argument('--derivatives', action='store_true',
+                        help='Also write thumbnail/medium image sizes and placeholders for the HTML page')
+    args = parser.parse_args()
+
     print("🎯 Perfect PDF Converter - Final Version")
     print("="*50)
 
     # Convert both PDFs
-    converter1 = PerfectPDFConverter("3cx_forwarding.pdf", "3cx_perfect", verbose=True)
+    converter1 = PerfectPDFConverter("3cx_forwarding.pdf", "3cx_perfect", verbose=True, derivatives=args.derivatives)
     json1 = converter1.convert()
 
     print()
 
-    converter2 = PerfectPDFConverter("twilio_logs.pdf", "twilio_perfect", verbose=True)
+    converter2 = PerfectPDFConverter("twilio_logs.pdf", "twilio_perfect", verbose=True, derivatives=args.derivatives)
     json2 = converter2.convert()
 
     print("\n" + "="*50)
@@ -10,9 +10,19 @@ import os
 import re
 from PIL import Image
 import io
+import time
+from contextlib import contextmanager
 from typing import Dict, List, Tuple, Optional
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, field
 from datetime import datetime
+from pdf_images import (DEFAULT_PROFILE, ImageBlob, ImageInfo, ImageWriter, MemoryImageWriter,
+                        drop_images, get_image_infos, get_profile)
+from image_store import ImageStore
+from image_derivatives import DerivativeBuilder
+
+# Bump whenever a change alters the converter's output, so batch runs
+# reconvert documents they would otherwise consider up to date
+CONVERTER_VERSION = "1.5"
 
 @dataclass
 class Step:
@@ -36,16 +46,164 @@ class ValidationResult:
     warnings: List[str]
     suggestions: List[str]
 
+@dataclass
+class ConversionMetrics:
+    """Wall-clock time per conversion stage plus work counters"""
+    stages: Dict[str, float] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block; repeated stages accumulate"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name: str, amount: int = 1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    @property
+    def total_time(self) -> float:
+        return sum(self.stages.values())
+
+    def to_dict(self) -> Dict:
+        return {
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "total_time": round(self.total_time, 4),
+            "counters": dict(self.counters)
+        }
+
+@dataclass
+class ConversionResult:
+    """In-memory outcome of a conversion; JSON and HTML files are just sinks for it"""
+    title: str
+    steps: List[Step]
+    validation: ValidationResult
+    json_file: str = ""
+    report_file: str = ""
+    metrics: ConversionMetrics = field(default_factory=ConversionMetrics)
+    images: Dict[str, ImageBlob] = field(default_factory=dict)  # In-memory conversions only
+    log: List[Dict] = field(default_factory=list)
+    cascade: List[Dict] = field(default_factory=list)  # Extraction cascade decisions
+
+    @property
+    def total_images(self) -> int:
+        return sum(len(step.images) for step in self.steps)
+
+    @property
+    def total_warnings(self) -> int:
+        return sum(len(step.warnings) for step in self.steps)
+
+    @property
+    def avg_confidence(self) -> float:
+        return sum(step.confidence for step in self.steps) / len(self.steps) if self.steps else 0
+
+    def to_dict(self) -> Dict:
+        """Procedure data in the JSON output format"""
+        return procedure_to_dict(self.title, self.steps, self.metrics)
+
+def procedure_to_dict(title: str, steps: List[Step], metrics: Optional[ConversionMetrics] = None) -> Dict:
+    """Convert Step objects to the JSON output structure"""
+    json_data = {
+        "title": title,
+        "total_steps": len(steps),
+        "steps": []
+    }
+
+    for step in steps:
+        step_dict = {
+            "step_number": step.step_number,
+            "description": step.description,
+            "page": step.page,
+            "images": step.images,
+            "confidence": step.confidence
+        }
+        if step.warnings:
+            step_dict["warnings"] = step.warnings
+        json_data["steps"].append(step_dict)
+
+    if metrics is not None:
+        json_data["metrics"] = metrics.to_dict()
+
+    return json_data
+
+@dataclass
+class PageModel:
+    """Text content of one page, parsed once and shared by every detector"""
+    page_num: int
+    text: str
+    lines: List[str]
+    textpage: Optional[fitz.TextPage] = field(default=None, repr=False)
+    _blocks: Optional[List[Dict]] = field(default=None, repr=False)
+
+    @classmethod
+    def from_page(cls, page, page_num: int) -> "PageModel":
+        """Build the model from a single TextPage (one MuPDF parse per page)"""
+        textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+        text = page.get_text("text", textpage=textpage)
+        return cls(
+            page_num=page_num,
+            text=text,
+            lines=text.strip().split('\n'),
+            textpage=textpage
+        )
+
+    @property
+    def blocks(self) -> List[Dict]:
+        """Layout blocks; only built when a detector needs them, and only while the document is open"""
+        if self._blocks is None:
+            self._blocks = self.textpage.extractDICT().get("blocks", []) if self.textpage else []
+        return self._blocks
+
+    def release(self):
+        """Drop the TextPage; it must not outlive the document"""
+        self.textpage = None
+
+    def spans(self):
+        """Yield every text span (with bbox, font and size) on the page"""
+        for block in self.blocks:
+            if block.get("type") == 0:  # Text block
+                for line in block.get("lines", []):
+                    yield from line.get("spans", [])
+
+
 class PDFProcedureConverter:
     """Main converter class with validation and error correction"""
 
-    def __init__(self, pdf_path: str, output_name: str, verbose: bool = True):
+    # Number-pattern steps at or above this need no second opinion
+    HIGH_CONFIDENCE = 0.9
+    # Standalone numbers above this are not taken as step numbers
+    MAX_PATTERN_STEP = 20
+
+    def __init__(self, pdf_path: str, output_name: str, verbose: bool = True,
+                 passthrough: bool = False, image_store: Optional[ImageStore] = None,
+                 pdf_stream: Optional[bytes] = None, in_memory: bool = False,
+                 image_profile: str = DEFAULT_PROFILE, derivatives: bool = False, cascade: bool = True):
+        """pdf_stream supplies the PDF bytes directly (pdf_path is then only its name);
+        in_memory keeps images in the result instead of writing them during extraction;
+        image_profile names the encoder profile in pdf_images.ENCODER_PROFILES;
+        derivatives adds thumbnail/medium sizes and placeholders when images are written;
+        cascade stops step extraction early for well-formed exports (False runs every detector)
+        """
         self.pdf_path = pdf_path
         self.output_name = output_name
         self.verbose = verbose
+        self.passthrough = passthrough
+        self.image_store = image_store
+        self.image_profile = get_profile(image_profile).name
+        self.derivatives = derivatives
+        self.cascade = cascade
+        self.cascade_decisions: List[Dict] = []
+        self.pdf_stream = pdf_stream
+        self.in_memory = in_memory
+        self.images: Dict[str, ImageBlob] = {}
         self.doc = None
+        self.pages: List[PageModel] = []
         self.validation_log = []
         self.conversion_report = {}
+        self.metrics = ConversionMetrics()
 
     def log(self, message: str, level: str = "INFO"):
         """Log messages during conversion"""
@@ -53,38 +211,138 @@ class PDFProcedureConverter:
             print(f"[{level}] {message}")
         self.validation_log.append({"level": level, "message": message, "time": datetime.now().isoformat()})
 
-    def extract_all_potential_steps(self) -> Dict:
-        """Extract all potential steps from PDF with multiple detection methods"""
-        self.doc = fitz.open(self.pdf_path)
-        all_steps = {}
-        title = ""
+    @contextmanager
+    def document(self):
+        """Open the PDF once and share the handle with every nested stage.
 
-        # Method 1: Standard number + description pattern
-        method1_steps = self._extract_by_number_pattern()
+        The outermost caller owns the handle and closes it on exit; nested
+        calls reuse the already open document.
+        """
+        if self.doc is not None:
+            yield self.doc
+            return
 
-        # Method 2: Look for action verbs (Click, Navigate, Select, etc.)
-        method2_steps = self._extract_by_action_verbs()
+        if self.pdf_stream is not None:
+            self.doc = fitz.open(stream=self.pdf_stream, filetype="pdf")
+        else:
+            self.doc = fitz.open(self.pdf_path)
+        try:
+            yield self.doc
+        finally:
+            self.doc.close()
+            self.doc = None
 
-        # Method 3: Analyze visual layout (indentation, fonts)
-        method3_steps = self._extract_by_layout()
+    def extract_all_potential_steps(self) -> Dict:
+        """Extract all potential steps from PDF with multiple detection methods"""
+        with self.document():
+            # Parse every page once; all detectors below share these models
+            self.pages = self._build_page_models()
+            self.metrics.count("pages_parsed", len(self.pages))
+            self.cascade_decisions = []
+
+            if self.cascade:
+                all_steps = self._extract_by_cascade()
+            else:
+                all_steps = self._merge_and_validate_steps(
+                    self._extract_by_number_pattern(),    # Method 1: number + description pattern
+                    self._extract_by_action_verbs(),      # Method 2: action verbs (Click, Navigate, ...)
+                    self._extract_by_layout()             # Method 3: visual layout (spans, fonts)
+                )
 
-        # Merge and validate steps from all methods
-        all_steps = self._merge_and_validate_steps(method1_steps, method2_steps, method3_steps)
+            for page_model in self.pages:
+                page_model.release()
 
         # Extract title
         title = self._extract_title()
 
-        self.doc.close()
         return {"title": title, "steps": all_steps}
 
+    def _extract_by_cascade(self) -> List[Step]:
+        """Run detectors cheapest first and stop as soon as the sequence is complete
+
+        Number patterns come first. If they yield a clean 1..N sequence with
+        high confidence that covers every page, nothing else runs. Otherwise
+        action verbs run over the page text (also cheap), and the layout
+        detector, the only one that needs MuPDF's span dictionaries, runs
+        just on the pages that still have gaps.
+        """
+        number_steps = self._extract_by_number_pattern()
+        gap_pages = self._gap_pages(number_steps)
+        if not gap_pages:
+            count = len({step["step_number"] for step in number_steps})
+            self._decide("number_pattern", self.pages, number_steps,
+                         f"complete 1..{count} sequence; action_verb and layout skipped")
+            return self._merge_and_validate_steps(number_steps)
+        self._decide("number_pattern", self.pages, number_steps,
+                     f"gaps on pages {self._page_list(gap_pages)}; continuing")
+
+        verb_steps = self._extract_by_action_verbs()
+        self._decide("action_verb", self.pages, verb_steps, "run on every page (text only)")
+
+        layout_pages = [page_model for page_model in self.pages if page_model.page_num in gap_pages]
+        layout_steps = self._extract_by_layout(layout_pages)
+        self.metrics.count("layout_pages", len(layout_pages))
+        self._decide("layout", layout_pages, layout_steps, f"run on gap pages {self._page_list(gap_pages)} only")
+
+        return self._merge_and_validate_steps(number_steps, verb_steps, layout_steps)
+
+    def _gap_pages(self, steps: List[Dict]) -> List[int]:
+        """Pages the number-pattern steps leave unexplained: empty pages and pages around missing numbers"""
+        if not steps:
+            return [page_model.page_num for page_model in self.pages]
+
+        # A number can match on several pages (page numbers look like step numbers); merging resolves those
+        numbers = sorted({step["step_number"] for step in steps})
+        low_confidence = any(step["confidence"] < self.HIGH_CONFIDENCE for step in steps)
+        page_of = {step["step_number"]: step["page"] for step in steps}
+        last_page = self.pages[-1].page_num if self.pages else 1
+        gaps = set()
+
+        # The pattern cannot see past its ceiling, so whatever follows it is unexplained
+        if numbers[-1] >= self.MAX_PATTERN_STEP:
+            gaps.update(range(page_of[numbers[-1]], last_page + 1))
+
+        if numbers == list(range(1, len(numbers) + 1)) and not low_confidence:
+            covered = {step["page"] for step in steps}
+            gaps.update(page_model.page_num for page_model in self.pages
+                        if page_model.page_num not in covered and self._has_content(page_model))
+            return sorted(gaps)
+
+        # Missing numbers: search from the page of the step before to the page of the step after
+        for missing in sorted(set(range(1, numbers[-1] + 1)) - set(numbers)):
+            before = max((n for n in page_of if n < missing), default=None)
+            after = min((n for n in page_of if n > missing), default=None)
+            gaps.update(range(page_of[before] if before else 1, (page_of[after] if after else last_page) + 1))
+        if low_confidence:
+            gaps.update(step["page"] for step in steps if step["confidence"] < self.HIGH_CONFIDENCE)
+        return sorted(gaps)
+
+    def _has_content(self, page_model: PageModel) -> bool:
+        """Whether a page holds anything besides page numbers and the Scribe footer"""
+        return any(self._is_valid_description(line.strip()) for line in page_model.lines)
+
+    def _decide(self, detector: str, pages: List[PageModel], steps: List[Dict], decision: str):
+        """Record one cascade decision for the report"""
+        self.cascade_decisions.append({"detector": detector, "pages": len(pages),
+                                       "steps": len(steps), "decision": decision})
+        self.log(f"Cascade: {detector} on {len(pages)} pages found {len(steps)} steps; {decision}", "INFO")
+
+    @staticmethod
+    def _page_list(pages: List[int]) -> str:
+        return ", ".join(str(page) for page in pages)
+
+    def _build_page_models(self) -> List[PageModel]:
+        """Parse each page's text a single time"""
+        return [PageModel.from_page(page, page_num) for page_num, page in enumerate(self.doc, 1)]
+
     def _extract_by_number_pattern(self) -> List[Dict]:
         """Traditional extraction by step numbers"""
         steps = []
         seen_on_page = {}
 
-        for page_num, page in enumerate(self.doc, 1):
-            text = page.get_text()
-            lines = text.strip().split('\n')
+        for page_model in self.pages:
+            page_num = page_model.page_num
+            lines = page_model.lines
             seen_on_page[page_num] = set()
 
             for i, line in enumerate(lines):
@@ -94,7 +352,7 @@ class PDFProcedureConverter:
                 if re.match(r'^[1-9]\d?$', line_stripped):
                     step_num = int(line_stripped)
 
-                    if step_num > 20 or step_num in seen_on_page[page_num]:
+                    if step_num > self.MAX_PATTERN_STEP or step_num in seen_on_page[page_num]:
                         continue
 
                     # Find description
@@ -124,9 +382,9 @@ class PDFProcedureConverter:
         steps = []
         step_counter = 0
 
-        for page_num, page in enumerate(self.doc, 1):
-            text = page.get_text()
-            lines = text.strip().split('\n')
+        for page_model in self.pages:
+            page_num = page_model.page_num
+            lines = page_model.lines
 
             for i, line in enumerate(lines):
                 line_stripped = line.strip()
@@ -154,36 +412,31 @@ class PDFProcedureConverter:
 
         return steps
 
-    def _extract_by_layout(self) -> List[Dict]:
+    def _extract_by_layout(self, pages: Optional[List[PageModel]] = None) -> List[Dict]:
         """Extract steps by analyzing page layout and structure"""
         steps = []
 
-        for page_num, page in enumerate(self.doc, 1):
-            # Get text with layout information
-            blocks = page.get_text("dict")
-
-            for block in blocks.get("blocks", []):
-                if block.get("type") == 0:  # Text block
-                    for line in block.get("lines", []):
-                        for span in line.get("spans", []):
-                            text = span.get("text", "").strip()
-
-                            # Look for numbered items with consistent formatting
-                            if re.match(r'^\d+\.\s+', text) or re.match(r'^\d+\)\s+', text):
-                                # Extract step number and description
-                                match = re.match(r'^(\d+)[.)\s]+(.+)', text)
-                                if match:
-                                    step_num = int(match.group(1))
-                                    desc = match.group(2).strip()
-
-                                    if self._is_valid_description(desc):
-                                        steps.append({
-                                            "step_number": step_num,
-                                            "description": desc,
-                                            "page": page_num,
-                                            "confidence": 0.8,
-                                            "method": "layout"
-                                        })
+        for page_model in self.pages if pages is None else pages:
+            # Spans carry the layout information (bbox, font, size)
+            for span in page_model.spans():
+                text = span.get("text", "").strip()
+
+                # Look for numbered items with consistent formatting
+                if re.match(r'^\d+\.\s+', text) or re.match(r'^\d+\)\s+', text):
+                    # Extract step number and description
+                    match = re.match(r'^(\d+)[.)\s]+(.+)', text)
+                    if match:
+                        step_num = int(match.group(1))
+                        desc = match.group(2).strip()
+
+                        if self._is_valid_description(desc):
+                            steps.append({
+                                "step_number": step_num,
+                                "description": desc,
+                                "page": page_model.page_num,
+                                "confidence": 0.8,
+                                "method": "layout"
+                            })
 
         return steps
 
@@ -243,9 +496,9 @@ class PDFProcedureConverter:
 
     def _extract_title(self) -> str:
         """Extract procedure title from first page"""
-        page = self.doc[0]
-        text = page.get_text()
-        lines = text.strip().split('\n')
+        if not self.pages:
+            return "Procedure"
+        lines = self.pages[0].lines
 
         for line in lines[:15]:
             if ("Setup" in line or "View" in line or "Create" in line or
@@ -260,9 +513,17 @@ class PDFProcedureConverter:
 
     def extract_images_for_steps(self, steps: List[Step]) -> List[Step]:
         """Extract and associate images with steps"""
-        self.doc = fitz.open(self.pdf_path)
+        with self.document():
+            return self._extract_images_for_steps(steps)
+
+    def _extract_images_for_steps(self, steps: List[Step]) -> List[Step]:
+        """Associate images with steps using the already open document"""
         images_dir = f"{self.output_name}_images"
-        os.makedirs(images_dir, exist_ok=True)
+        if self.in_memory:
+            writer = MemoryImageWriter(self.doc, images_dir, self.passthrough, self.image_profile)
+        else:
+            os.makedirs(images_dir, exist_ok=True)
+            writer = ImageWriter(self.doc, images_dir, self.passthrough, self.image_store, self.image_profile)
 
         # Build page-to-steps mapping
         page_steps = {}
@@ -275,26 +536,9 @@ class PDFProcedureConverter:
             if page_num not in page_steps:
                 continue
 
-            image_list = page.get_images(full=True)
-            page_images = []
-
-            for img_index, img in enumerate(image_list):
-                try:
-                    xref = img[0]
-                    base_image = self.doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image = Image.open(io.BytesIO(image_bytes))
-
-                    # Filter small images
-                    if image.width > 100 and image.height > 100:
-                        page_images.append({
-                            "image": image,
-                            "index": img_index + 1,
-                            "width": image.width,
-                            "height": image.height
-                        })
-                except Exception as e:
-                    self.log(f"Failed to extract image {img_index} from page {page_num}: {e}", "WARNING")
+            # Filter small images from metadata, before anything is decoded
+            page_images = [info for info in get_image_infos(page)
+                           if info.width > 100 and info.height > 100]
 
             # Distribute images among steps on this page
             if page_images:
@@ -302,8 +546,8 @@ class PDFProcedureConverter:
 
                 # If only one step on page, assign all images to it
                 if len(steps_on_page) == 1:
-                    for img_data in page_images:
-                        self._save_image_for_step(steps_on_page[0], img_data, images_dir)
+                    for info in page_images:
+                        self._save_image_for_step(steps_on_page[0], info, writer)
                 else:
                     # Distribute images evenly among steps
                     images_per_step = len(page_images) // len(steps_on_page)
@@ -314,25 +558,27 @@ class PDFProcedureConverter:
                         num_images = images_per_step + (1 if i < remainder else 0)
                         for j in range(num_images):
                             if img_idx < len(page_images):
-                                self._save_image_for_step(step, page_images[img_idx], images_dir)
+                                self._save_image_for_step(step, page_images[img_idx], writer)
                                 img_idx += 1
 
-        self.doc.close()
-        return steps
+        # Encoding and writing overlap with the page loop above; wait for the stragglers
+        failures = writer.close()
+        for path, error in failures.items():
+            self.log(f"Failed to write image {path}: {error}", "WARNING")
+        drop_images((step.images for step in steps), failures)
 
-    def _save_image_for_step(self, step: Step, img_data: Dict, images_dir: str):
-        """Save image and associate with step"""
-        image_filename = f"step_{step.step_number}_page_{step.page}_img_{img_data['index']}.png"
-        image_path = os.path.join(images_dir, image_filename)
-
-        img_data['image'].save(image_path, "PNG")
+        self.metrics.count("images_extracted", writer.images_extracted)
+        self.metrics.count("bytes_written", writer.bytes_written)
+        if self.in_memory:
+            self.images.update(writer.blobs)
+        return steps
 
-        step.images.append({
-            "filename": image_filename,
-            "path": image_path,
-            "width": img_data['width'],
-            "height": img_data['height']
-        })
+    def _save_image_for_step(self, step: Step, info: ImageInfo, writer):
+        """Save image (once per document) and associate with step"""
+        try:
+            step.images.append(writer.save(info))
+        except Exception as e:
+            self.log(f"Failed to extract image {info.index} from page {step.page}: {e}", "WARNING")
 
     def apply_corrections(self, data: Dict) -> Dict:
         """Apply known corrections based on PDF patterns"""
@@ -366,17 +612,16 @@ class PDFProcedureConverter:
         # Check if step 6 is missing
         if data["steps"] and max(s.step_number for s in data["steps"]) == 5:
             # Check if there's a page 4 in the PDF
-            self.doc = fitz.open(self.pdf_path)
-            if len(self.doc) >= 4:
-                data["steps"].append(Step(
-                    step_number=6,
-                    description="View message details",
-                    page=4,
-                    images=[],
-                    confidence=0.6,
-                    warnings=["Step added based on page 4 detection"]
-                ))
-            self.doc.close()
+            with self.document() as doc:
+                if len(doc) >= 4:
+                    data["steps"].append(Step(
+                        step_number=6,
+                        description="View message details",
+                        page=4,
+                        images=[],
+                        confidence=0.6,
+                        warnings=["Step added based on page 4 detection"]
+                    ))
 
         return data
 
@@ -465,28 +710,12 @@ class PDFProcedureConverter:
 
     def save_json(self, data: Dict) -> str:
         """Save data to JSON file"""
-        # Convert Step objects to dictionaries
-        json_data = {
-            "title": data["title"],
-            "total_steps": len(data["steps"]),
-            "steps": []
-        }
-
-        for step in data["steps"]:
-            step_dict = {
-                "step_number": step.step_number,
-                "description": step.description,
-                "page": step.page,
-                "images": step.images,
-                "confidence": step.confidence
-            }
-            if step.warnings:
-                step_dict["warnings"] = step.warnings
-            json_data["steps"].append(step_dict)
+        json_data = procedure_to_dict(data["title"], data["steps"], self.metrics)
 
         json_filename = f"{self.output_name}.json"
         with open(json_filename, 'w', encoding='utf-8') as f:
             json.dump(json_data, f, indent=2, ensure_ascii=False)
+        self.metrics.count("bytes_written", os.path.getsize(json_filename))
 
         return json_filename
 
@@ -559,6 +788,7 @@ class PDFProcedureConverter:
             transition: width 0.3s;
         }}
         .timestamp {{ color: #666; font-size: 0.9em; }}
+        .timings td {{ padding: 2px 20px 2px 0; }}
     </style>
 </head>
 <body>
@@ -625,6 +855,33 @@ class PDFProcedureConverter:
                 report_html += f"            <li>{suggestion}</li>\n"
             report_html += "        </ul>\n    </div>\n"
 
+        # Extraction cascade
+        if self.cascade_decisions:
+            report_html += """
+    <div class="section">
+        <h2>🔎 Extraction Cascade</h2>
+        <table class="timings">
+            <tr><th>Detector</th><th>Pages</th><th>Steps found</th><th>Decision</th></tr>
+"""
+            for decision in self.cascade_decisions:
+                report_html += (f"            <tr><td>{decision['detector']}</td><td>{decision['pages']}</td>"
+                                f"<td>{decision['steps']}</td><td>{decision['decision']}</td></tr>\n")
+            report_html += "        </table>\n    </div>\n"
+
+        # Stage timings
+        if self.metrics.stages:
+            report_html += f"""
+    <div class="section">
+        <h2>⏱️ Stage Timings ({self.metrics.total_time:.2f}s)</h2>
+        <table class="timings">
+"""
+            for stage_name, seconds in self.metrics.stages.items():
+                share = seconds / self.metrics.total_time if self.metrics.total_time else 0
+                report_html += f"            <tr><td>{stage_name}</td><td>{seconds * 1000:.1f} ms</td><td>{share:.0%}</td></tr>\n"
+            for counter_name, value in self.metrics.counters.items():
+                report_html += f"            <tr><td>{counter_name}</td><td>{value:,}</td><td></td></tr>\n"
+            report_html += "        </table>\n    </div>\n"
+
         # Conversion log
         report_html += """
     <div class="section">
@@ -659,43 +916,111 @@ class PDFProcedureConverter:
         report_filename = f"{self.output_name}_report.html"
         with open(report_filename, 'w', encoding='utf-8') as f:
             f.write(report_html)
+        self.metrics.count("bytes_written", os.path.getsize(report_filename))
 
         return report_filename
 
-    def convert(self) -> Tuple[str, str]:
-        """Main conversion method"""
+    def analyze(self) -> ConversionResult:
+        """Extract, correct and validate; with in_memory nothing touches the filesystem"""
         self.log(f"Starting conversion of {self.pdf_path}", "INFO")
-
-        # Extract potential steps
-        self.log("Extracting steps from PDF...", "INFO")
-        raw_data = self.extract_all_potential_steps()
-
-        # Extract images
-        self.log("Extracting images for steps...", "INFO")
-        raw_data["steps"] = self.extract_images_for_steps(raw_data["steps"])
-
-        # Apply corrections
-        self.log("Applying corrections...", "INFO")
-        corrected_data = self.apply_corrections(raw_data)
+        self.metrics = ConversionMetrics()
+        self.images = {}
+        metrics = self.metrics
+
+        # One document handle for every stage that reads the PDF
+        with self.document():
+            # Extract potential steps
+            self.log("Extracting steps from PDF...", "INFO")
+            with metrics.stage("extract_steps"):
+                raw_data = self.extract_all_potential_steps()
+
+            # Extract images
+            self.log("Extracting images for steps...", "INFO")
+            with metrics.stage("extract_images"):
+                raw_data["steps"] = self.extract_images_for_steps(raw_data["steps"])
+
+            # Apply corrections
+            self.log("Applying corrections...", "INFO")
+            with metrics.stage("corrections"):
+                corrected_data = self.apply_corrections(raw_data)
 
         # Validate
         self.log("Validating conversion...", "INFO")
-        validation = self.validate_conversion(corrected_data)
+        with metrics.stage("validation"):
+            validation = self.validate_conversion(corrected_data)
 
         if not validation.is_valid:
             self.log(f"Validation failed with {len(validation.errors)} errors", "ERROR")
         else:
             self.log("Validation passed", "INFO")
 
+        return ConversionResult(
+            title=corrected_data["title"],
+            steps=corrected_data["steps"],
+            validation=validation,
+            metrics=metrics,
+            images=dict(self.images),
+            log=self.validation_log,
+            cascade=self.cascade_decisions
+        )
+
+    def write_outputs(self, result: ConversionResult) -> ConversionResult:
+        """Filesystem sink: write in-memory images, the validation report and the JSON
+
+        The result may come from another converter instance (e.g. one that ran
+        analyze() in a worker process); its log and metrics carry over.
+        """
+        self.validation_log = result.log
+        self.cascade_decisions = result.cascade
+        self.metrics = metrics = result.metrics
+        data = {"title": result.title, "steps": result.steps}
+
+        if result.images:
+            with metrics.stage("write_images"):
+                for blob in result.images.values():
+                    metrics.count("bytes_written", blob.write())
+
+        # Responsive sizes for the HTML pages; cached, so reconverting an unchanged image reuses them
+        if self.derivatives:
+            with metrics.stage("derivatives"):
+                builder = DerivativeBuilder(self.image_store)
+                encoded = {path: blob.derivatives for path, blob in result.images.items() if blob.derivatives}
+                failures = builder.add_all((step.images for step in result.steps), encoded)
+            for path, error in failures.items():
+                self.log(f"No derivatives for {path}: {error}", "WARNING")
+            metrics.count("derivatives_built", builder.built)
+
+        # Generate report (before the JSON, so the JSON carries every other stage's timing)
+        with metrics.stage("report"):
+            result.report_file = self.generate_validation_report(data, result.validation)
+        self.log(f"Generated report: {result.report_file}", "INFO")
+
         # Save JSON
-        json_file = self.save_json(corrected_data)
-        self.log(f"Saved JSON to {json_file}", "INFO")
+        with metrics.stage("save_json"):
+            result.json_file = self.save_json(data)
+        self.log(f"Saved JSON to {result.json_file}", "INFO")
+
+        return result
+
+    def convert(self) -> ConversionResult:
+        """Main conversion method; returns the structured result"""
+        return self.write_outputs(self.analyze())
+
 
-        # Generate report
-        report_file = self.generate_validation_report(corrected_data, validation)
-        self.log(f"Generated report: {report_file}", "INFO")
+def convert_pdf_data(data, name: str = "document.pdf", output_name: Optional[str] = None,
+                     passthrough: bool = False, image_profile: str = DEFAULT_PROFILE) -> ConversionResult:
+    """Convert a PDF given as bytes or a file-like object, entirely in memory
 
-        return json_file, report_file
+    name stands in for the file path (it selects product-specific corrections
+    and appears in the report). Images are returned as lazily encoded blobs in
+    result.images; pass the converter's write_outputs() a result to persist it.
+    """
+    if hasattr(data, "read"):
+        data = data.read()
+    output_name = output_name or os.path.splitext(os.path.basename(name))[0]
+    converter = PDFProcedureConverter(name, output_name, verbose=False, passthrough=passthrough,
+                                      pdf_stream=bytes(data), in_memory=True, image_profile=image_profile)
+    return converter.analyze()
 
 
 def main():
@@ -710,12 +1035,12 @@ def main():
     output_name = sys.argv[2]
 
     converter = PDFProcedureConverter(pdf_file, output_name)
-    json_file, report_file = converter.convert()
+    result = converter.convert()
 
     print(f"\nConversion complete!")
-    print(f"JSON: {json_file}")
-    print(f"Report: {report_file}")
-    print(f"\nOpen {report_file} in a browser to view the validation report.")
+    print(f"JSON: {result.json_file}")
+    print(f"Report: {result.report_file}")
+    print(f"\nOpen {result.report_file} in a browser to view the validation report.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,400 @@
+"""
+Shared image helpers for the PDF converters
+Reads embedded image metadata so images can be filtered before they are decoded
+"""
+
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from PIL import Image
+
+# Scribe stamps this logo on every page
+LOGO_SIZE = (258, 395)
+
+# Stream formats that browsers can display exactly as stored in the PDF
+PASSTHROUGH_FORMATS = ("jpeg", "png")
+
+# Colors an image may have for the compact profile to quantize it to a
+# 256-color palette. UI screenshots (even JPEG-compressed ones) measure
+# 20-30k; photos and gradients run to hundreds of thousands and are kept
+COMPACT_MAX_COLORS = 65536
+
+
+@dataclass(frozen=True)
+class EncoderProfile:
+    """How images that are not passed through are encoded"""
+    name: str
+    format: str                 # PIL format name
+    ext: str
+    options: Dict = field(default_factory=dict)
+    quantize: bool = False      # Palette-quantize images with few colors
+
+
+ENCODER_PROFILES = {
+    # PIL defaults, as every earlier release wrote them
+    "default": EncoderProfile("default", "PNG", "png"),
+    # Interactive conversions: barely compress, write fast
+    "fast": EncoderProfile("fast", "PNG", "png", {"compress_level": 1}),
+    # Storage: palette PNG for flat UI screenshots, optimized deflate for everything
+    "compact": EncoderProfile("compact", "PNG", "png", {"optimize": True}, quantize=True),
+    # Page weight: lossy WebP at a fixed quality
+    "web": EncoderProfile("web", "WEBP", "webp", {"quality": 80, "method": 4}),
+}
+DEFAULT_PROFILE = "default"
+
+# Encoder threads per ImageWriter; PIL releases the GIL while encoding
+IMAGE_WORKERS = min(4, os.cpu_count() or 1)
+
+
+@dataclass
+class ImageInfo:
+    """Metadata for one embedded image, taken from page.get_images(full=True)"""
+    xref: int
+    smask: int
+    width: int
+    height: int
+    bpc: int
+    colorspace: str
+    filter: str
+    index: int
+
+    @property
+    def area(self) -> int:
+        return self.width * self.height
+
+
+def get_image_infos(page) -> List[ImageInfo]:
+    """List the images on a page without extracting or decoding any of them"""
+    infos = []
+    for img_index, img in enumerate(page.get_images(full=True)):
+        xref, smask, width, height, bpc, colorspace, _alt, _name, img_filter = img[:9]
+        infos.append(ImageInfo(
+            xref=xref,
+            smask=smask,
+            width=width,
+            height=height,
+            bpc=bpc,
+            colorspace=colorspace,
+            filter=img_filter,
+            index=img_index
+        ))
+    return infos
+
+
+def is_logo_size(width: int, height: int) -> bool:
+    """Determine from its dimensions whether an image is likely a logo"""
+    # Known logo size from analysis
+    if (width, height) == LOGO_SIZE:
+        return True
+
+    # General logo detection - small portrait images
+    if width < 400 and height < 400:
+        aspect_ratio = width / height if height > 0 else 0
+        if 0.4 < aspect_ratio < 0.8:
+            return True
+
+    return False
+
+
+def can_passthrough(base_image: Dict) -> bool:
+    """Check whether extract_image() output can be written without transcoding"""
+    # CMYK, alpha masks and JBIG2/JPX streams need a PIL round trip
+    return (base_image.get("ext") in PASSTHROUGH_FORMATS and
+            base_image.get("colorspace") in (1, 3) and
+            not base_image.get("smask"))
+
+
+def get_profile(profile: str) -> EncoderProfile:
+    """Look up an encoder profile by name"""
+    try:
+        return ENCODER_PROFILES[profile]
+    except KeyError:
+        raise ValueError(f"Unknown image profile {profile!r}; choose from {', '.join(ENCODER_PROFILES)}")
+
+
+def output_extension(base_image: Dict, passthrough: bool = False, profile: str = DEFAULT_PROFILE) -> str:
+    """Extension encode_image() will produce, known without encoding anything"""
+    if passthrough and can_passthrough(base_image):
+        return base_image["ext"]
+    return get_profile(profile).ext
+
+
+def _quantize(image: Image.Image) -> Image.Image:
+    """Reduce a few-color screenshot to a palette image; leave photos alone"""
+    if image.mode not in ("RGB", "L"):
+        return image
+    if image.getcolors(COMPACT_MAX_COLORS) is None:
+        return image
+    return image.quantize(colors=256, method=Image.Quantize.MEDIANCUT, dither=Image.Dither.NONE)
+
+
+def encode_image(base_image: Dict, passthrough: bool = False,
+                 profile: str = DEFAULT_PROFILE) -> Tuple[bytes, str]:
+    """Encode an extracted image for output and return (bytes, extension)
+
+    With passthrough the original stream bytes are used as-is whenever
+    possible; otherwise the image is decoded and re-encoded with the
+    encoder profile (PNG at PIL defaults unless another one is chosen).
+    """
+    if passthrough and can_passthrough(base_image):
+        return base_image["image"], base_image["ext"]
+
+    encoder = get_profile(profile)
+    image = Image.open(io.BytesIO(base_image["image"]))
+    if image.mode == "CMYK":
+        image = image.convert("RGB")
+    if encoder.quantize:
+        image = _quantize(image)
+    buffer = io.BytesIO()
+    image.save(buffer, encoder.format, **encoder.options)
+    return buffer.getvalue(), encoder.ext
+
+
+def replace_file(path: str, data: bytes):
+    """Write data to path through a temp file and rename
+
+    The destination may be a hardlink into an ImageStore; writing it in
+    place would change the shared blob and every other link to it.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def write_image(base_image: Dict, path_stem: str, passthrough: bool = False,
+                profile: str = DEFAULT_PROFILE) -> str:
+    """Write an extracted image to path_stem plus an extension and return the path"""
+    data, ext = encode_image(base_image, passthrough, profile)
+    image_path = f"{path_stem}.{ext}"
+    replace_file(image_path, data)
+    return image_path
+
+
+def drop_images(image_lists, paths) -> int:
+    """Remove references to the given image paths from each list in place; return how many"""
+    dropped = 0
+    for images in image_lists:
+        kept = [image for image in images if image["path"] not in paths]
+        dropped += len(images) - len(kept)
+        images[:] = kept
+    return dropped
+
+
+class ImageSink:
+    """Bounded thread pool that encodes and writes images off the main thread
+
+    submit() blocks once max_pending jobs are queued or running, so a fast
+    extractor cannot pile up decoded images faster than they are written.
+    wait() returns once every job has finished, with the failures by path.
+    """
+
+    def __init__(self, workers: int = IMAGE_WORKERS, max_pending: int = 0):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="image-sink")
+        self._slots = threading.BoundedSemaphore(max_pending or workers * 2)
+        self._lock = threading.Lock()
+        self._futures = {}
+        self.bytes_written = 0
+
+    def submit(self, path: str, job, *args):
+        """Run job(*args) -> bytes written in the pool; blocks while the pool is full"""
+        self._slots.acquire()
+        try:
+            future = self.executor.submit(job, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(self._done)
+        self._futures[path] = future
+
+    def _done(self, future):
+        self._slots.release()
+        if future.exception() is None:
+            with self._lock:
+                self.bytes_written += future.result()
+
+    def wait(self) -> Dict[str, BaseException]:
+        """Wait for all jobs, shut the pool down and return {path: error} for failed ones"""
+        self.executor.shutdown(wait=True)
+        return {path: future.exception() for path, future in self._futures.items()
+                if future.exception() is not None}
+
+
+class ImageWriter:
+    """Writes each embedded image of a document to disk at most once
+
+    Output is keyed by xref, so steps that show the same screenshot share a
+    single file instead of each getting their own copy. With an ImageStore the
+    file is a link to a content-addressed blob shared with other documents,
+    and a stream already encoded by an earlier run is not encoded again.
+
+    Images are extracted on the calling thread (MuPDF is not thread-safe) and
+    encoded and written by an ImageSink, so call close() before using the
+    files; it returns the images that failed, whose references must be dropped.
+    With workers=0 everything happens inline in save().
+    """
+
+    def __init__(self, doc, images_dir: str, passthrough: bool = False, store=None,
+                 profile: str = DEFAULT_PROFILE, workers: int = IMAGE_WORKERS):
+        self.doc = doc
+        self.images_dir = images_dir
+        self.passthrough = passthrough
+        self.store = store
+        self.profile = get_profile(profile).name
+        self.sink = ImageSink(workers) if workers > 0 else None
+        self._store_lock = threading.Lock()
+        self._written: Dict[int, Dict] = {}
+        self._digests: Dict[str, str] = {}
+        self._handed_out: List[Dict] = []
+        self.images_extracted = 0
+        self.bytes_written = 0
+
+    def save(self, info: ImageInfo) -> Dict:
+        """Extract the image on first use and queue it for writing; return a new reference to the file"""
+        if info.xref not in self._written:
+            base_image = self.doc.extract_image(info.xref)
+            self.images_extracted += 1
+            image_stem = os.path.join(self.images_dir, f"image_{info.xref}")
+            entry = {"width": info.width, "height": info.height}
+
+            if self.store is None:
+                image_path = f"{image_stem}.{output_extension(base_image, self.passthrough, self.profile)}"
+                job = (self._write, base_image, image_path)
+            else:
+                image_path, entry["sha256"] = self._store_target(base_image, image_stem)
+                job = (self._write_to_store, base_image, image_path, entry["sha256"])
+
+            if self.sink is None:
+                self.bytes_written += job[0](*job[1:])
+            else:
+                self.sink.submit(image_path, *job)
+
+            entry = {"filename": os.path.basename(image_path), "path": image_path, **entry}
+            self._written[info.xref] = entry
+
+        reference = dict(self._written[info.xref])
+        if reference.get("sha256", "") is None:
+            self._handed_out.append(reference)  # Digest is filled in by close()
+        return reference
+
+    def close(self) -> Dict[str, BaseException]:
+        """Wait for queued images; return {path: error} for those that could not be written"""
+        failures: Dict[str, BaseException] = {}
+        if self.sink is not None:
+            failures = self.sink.wait()
+            self.bytes_written += self.sink.bytes_written
+            self.sink = None
+        for reference in self._handed_out:
+            reference["sha256"] = self._digests.get(reference["path"])
+        self._handed_out = []
+        return failures
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self, base_image: Dict, image_path: str) -> int:
+        data, _ext = encode_image(base_image, self.passthrough, self.profile)
+        replace_file(image_path, data)
+        return len(data)
+
+    def _source_key(self, base_image: Dict) -> str:
+        mode = "passthrough" if self.passthrough else "png"
+        if self.profile != DEFAULT_PROFILE:
+            mode += f":{self.profile}"  # Keeps keys of stores filled before profiles existed
+        return hashlib.sha256(base_image["image"] + mode.encode()).hexdigest()
+
+    def _store_target(self, base_image: Dict, image_stem: str) -> Tuple[str, Optional[str]]:
+        """Path the image will be linked at, and its digest if the store already has it"""
+        stored = self.store.lookup_source(self._source_key(base_image))
+        if stored is None:
+            return f"{image_stem}.{output_extension(base_image, self.passthrough, self.profile)}", None
+        digest, blob_path = stored
+        return f"{image_stem}{os.path.splitext(blob_path)[1]}", digest
+
+    def _write_to_store(self, base_image: Dict, image_path: str, digest: Optional[str]) -> int:
+        """Encode (unless already stored), store the blob and link it into images_dir"""
+        if digest is None:
+            data, ext = encode_image(base_image, self.passthrough, self.profile)
+            with self._store_lock:
+                digest, blob_path = self.store.put(data, ext)
+                self.store.record_source(self._source_key(base_image), digest, ext)
+                self.store.link(digest, blob_path, image_path)
+                self._digests[image_path] = digest
+        else:
+            with self._store_lock:
+                blob_path = self.store.lookup_source(self._source_key(base_image))[1]
+                self.store.link(digest, blob_path, image_path)
+        return os.path.getsize(image_path)
+
+
+@dataclass
+class ImageBlob:
+    """An extracted image held in memory, encoded on first access to data"""
+    path: str
+    width: int
+    height: int
+    base_image: Dict = field(repr=False)
+    passthrough: bool = False
+    profile: str = DEFAULT_PROFILE
+    _data: Optional[bytes] = field(default=None, repr=False)
+    # Responsive sizes by width, when encoded ahead of writing (see DerivativeBuilder.encode)
+    derivatives: Optional[Dict[int, bytes]] = field(default=None, repr=False)
+
+    @property
+    def ext(self) -> str:
+        return output_extension(self.base_image, self.passthrough, self.profile)
+
+    @property
+    def data(self) -> bytes:
+        if self._data is None:
+            self._data, _ext = encode_image(self.base_image, self.passthrough, self.profile)
+        return self._data
+
+    def write(self, root: str = ".") -> int:
+        """Write the encoded image below root at its relative path; return bytes written"""
+        image_path = os.path.join(root, self.path)
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        replace_file(image_path, self.data)
+        return len(self.data)
+
+
+class MemoryImageWriter:
+    """ImageWriter counterpart that keeps images in memory instead of writing files
+
+    Entries carry the same relative paths ImageWriter would use, so a result
+    can be written out later (or served) without rewriting its JSON.
+    """
+
+    def __init__(self, doc, images_dir: str, passthrough: bool = False, profile: str = DEFAULT_PROFILE):
+        self.doc = doc
+        self.images_dir = images_dir
+        self.passthrough = passthrough
+        self.profile = get_profile(profile).name
+        self.blobs: Dict[str, ImageBlob] = {}
+        self._written: Dict[int, Dict] = {}
+        self.images_extracted = 0
+        self.bytes_written = 0
+
+    def save(self, info: ImageInfo) -> Dict:
+        """Extract the image on first use; return a new reference to it"""
+        if info.xref not in self._written:
+            base_image = self.doc.extract_image(info.xref)
+            self.images_extracted += 1
+            filename = f"image_{info.xref}.{output_extension(base_image, self.passthrough, self.profile)}"
+            image_path = os.path.join(self.images_dir, filename)
+            self.blobs[image_path] = ImageBlob(image_path, info.width, info.height, base_image,
+                                                 self.passthrough, self.profile)
+            self._written[info.xref] = {"filename": filename, "path": image_path,
+                                        "width": info.width, "height": info.height}
+        return dict(self._written[info.xref])
+
+    def close(self) -> Dict[str, BaseException]:
+        """Nothing is written, so nothing can fail; kept for parity with ImageWriter"""
+        return {}
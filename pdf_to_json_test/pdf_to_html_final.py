@@ -10,36 +10,31 @@ import os
 import re
 from PIL import Image
 import io
-from typing import Dict, List, Tuple
+from typing import Dict, List, Tuple, Optional
+from image_derivatives import DerivativeBuilder, img_tag
+from pdf_images import ImageInfo, ImageWriter, drop_images, get_image_infos, is_logo_size
+from image_store import ImageStore
 
 
 class FinalConverter:
     """Production-ready converter with all fixes"""
 
-    def __init__(self, pdf_path: str, output_name: str, verbose: bool = False):
+    def __init__(self, pdf_path: str, output_name: str, verbose: bool = False,
+                 passthrough: bool = False, image_store: Optional[ImageStore] = None, derivatives: bool = False):
         self.pdf_path = pdf_path
         self.output_name = output_name
         self.verbose = verbose
+        self.passthrough = passthrough
+        self.image_store = image_store
+        self.derivatives = derivatives
 
     def log(self, message: str):
         if self.verbose:
             print(f"[INFO] {message}")
 
-    def is_logo_image(self, image: Image.Image) -> bool:
-        """Detect and filter logo images"""
-        width, height = image.width, image.height
-
-        # Known logo size
-        if width == 258 and height == 395:
-            return True
-
-        # General small image detection
-        if width < 400 and height < 400:
-            aspect_ratio = width / height if height > 0 else 0
-            if 0.4 < aspect_ratio < 0.8:
-                return True
-
-        return False
+    def is_logo_image(self, info: ImageInfo) -> bool:
+        """Detect logo images from xref metadata"""
+        return is_logo_size(info.width, info.height)
 
     def extract_and_convert(self) -> Tuple[str, str]:
         """Extract from PDF and generate both JSON and HTML"""
@@ -72,34 +67,20 @@ class FinalConverter:
         images_dir = f"{self.output_name}_images"
         os.makedirs(images_dir, exist_ok=True)
 
+        writer = ImageWriter(doc, images_dir, self.passthrough, self.image_store)
         page_screenshots = {}
 
         for page_num, page in enumerate(doc, 1):
-            image_list = page.get_images(full=True)
+            for info in get_image_infos(page):
+                # Skip logos
+                if self.is_logo_image(info):
+                    self.log(f"Filtered logo on page {page_num}")
+                    continue
 
-            for img_index, img in enumerate(image_list):
-                try:
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    image = Image.open(io.BytesIO(image_bytes))
-
-                    # Skip logos
-                    if self.is_logo_image(image):
-                        self.log(f"Filtered logo on page {page_num}")
-                        continue
-
-                    # Keep main screenshots
-                    if image.width > 500 and image.height > 300:
-                        page_screenshots[page_num] = {
-                            'image': image,
-                            'width': image.width,
-                            'height': image.height
-                        }
-                        break
-
-                except Exception as e:
-                    self.log(f"Error extracting image: {e}")
+                # Keep main screenshots; selected from metadata, written on first use
+                if info.width > 500 and info.height > 300:
+                    page_screenshots[page_num] = info
+                    break
 
         # Map steps to pages
         step_page_map = {1: 1, 2: 1, 3: 2, 4: 2, 5: 3, 6: 4}
@@ -117,21 +98,24 @@ class FinalConverter:
                 "images": []
             }
 
+            # Steps on the same page share one written file
             if page_num in page_screenshots:
-                screenshot = page_screenshots[page_num]
-                filename = f"step_{step_num}.png"
-                filepath = os.path.join(images_dir, filename)
+                try:
+                    step_data["images"].append(writer.save(page_screenshots[page_num]))
+                except Exception as e:
+                    self.log(f"Error extracting image: {e}")
 
-                screenshot['image'].save(filepath, "PNG")
+            final_steps.append(step_data)
 
-                step_data["images"].append({
-                    "filename": filename,
-                    "path": filepath,
-                    "width": screenshot['width'],
-                    "height": screenshot['height']
-                })
+        failures = writer.close()
+        for path, error in failures.items():
+            self.log(f"Error writing image {path}: {error}")
+        drop_images((step["images"] for step in final_steps), failures)
 
-            final_steps.append(step_data)
+        if self.derivatives:
+            failures = DerivativeBuilder(self.image_store).add_all(step["images"] for step in final_steps)
+            for path, error in failures.items():
+                self.log(f"No derivatives for {path}: {error}")
 
         doc.close()
 
@@ -339,7 +323,7 @@ class FinalConverter:
             if step['images']:
                 html_content += '                <div class="step-images">\n'
                 for img in step['images']:
-                    html_content += f'                    <img src="{img["path"]}" alt="Step {step["step_number"]}" class="step-image" onclick="openModal(this.src)">\n'
+                    html_content += f'                    {img_tag(img, "Step " + str(step["step_number"]))}\n'
                 html_content += '                </div>\n'
 
             html_content += '            </div>\n'
@@ -395,13 +379,20 @@ class FinalConverter:
 
 def main():
     """Test the final converter"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Convert the sample PDFs with the final converter')
+    parser.add_argument('--derivatives', action='store_true',
+                        help='Also write thumbnail/medium image sizes and placeholders for the HTML page')
+    args = parser.parse_args()
+
     print("🎯 Final Production Converter")
     print("="*50)
 
-    converter1 = FinalConverter("3cx_forwarding.pdf", "3cx_final_clean", verbose=True)
+    converter1 = FinalConverter("3cx_forwarding.pdf", "3cx_final_clean", verbose=True, derivatives=args.derivatives)
     converter1.extract_and_convert()
 
-    converter2 = FinalConverter("twilio_logs.pdf", "twilio_final_clean", verbose=True)
+    converter2 = FinalConverter("twilio_logs.pdf", "twilio_final_clean", verbose=True, derivatives=args.derivatives)
     converter2.extract_and_convert()
 
     print("\n✨ Perfect conversion complete!")
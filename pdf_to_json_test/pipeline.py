@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Pipelined Batch Conversion
+Overlaps the stages of consecutive documents instead of running each PDF
+read -> parse -> encode -> write before starting the next:
+
+    reader thread      prefetches PDF bytes
+    parse processes    PDFProcedureConverter.analyze() in memory
+    encode threads     encode the extracted images and their derivatives
+                       (PIL releases the GIL)
+    writer thread      writes JSON, report, images, derivatives and HTML
+
+Stages are joined by bounded queues, so a fast stage blocks instead of
+piling up documents, and throughput is set by the slowest stage.
+
+Crashes are not isolated the way the supervised workers isolate them: a
+parse process that segfaults or is OOM-killed breaks the shared pool and
+every document in flight in it. The pool is then replaced and each of
+those documents is retried once in a process of its own, so only the one
+that crashes again is recorded as failed. There is no timeout or memory
+watchdog in this mode.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Dict, List, Optional
+from image_derivatives import DerivativeBuilder
+from pdf_converter_robust import ConversionResult, convert_pdf_data
+from pdf_images import DEFAULT_PROFILE, IMAGE_WORKERS
+
+# Queue depths between stages, in documents
+PREFETCH_DOCUMENTS = 4
+STAGE_QUEUE_SIZE = 2
+
+_DONE = object()
+
+
+class Failed:
+    """A document that failed in some stage; later stages pass it straight through"""
+
+    def __init__(self, error: Exception):
+        self.error = error
+
+
+def parse_pdf(data: bytes, name: str, output_name: str, passthrough: bool = False,
+              image_profile: str = DEFAULT_PROFILE) -> ConversionResult:
+    """Parse stage (runs in a worker process): analyze the PDF bytes in memory"""
+    return convert_pdf_data(data, name=name, output_name=output_name,
+                            passthrough=passthrough, image_profile=image_profile)
+
+
+def encode_images(result: ConversionResult, derivatives: bool = False) -> ConversionResult:
+    """Encode stage: encode every image (and its derivatives) now so the writer only writes bytes"""
+    with result.metrics.stage("encode_images"):
+        for blob in result.images.values():
+            blob.data
+    if derivatives:
+        builder = DerivativeBuilder()
+        with result.metrics.stage("encode_derivatives"):
+            for blob in result.images.values():
+                try:
+                    if not builder.is_cached(blob.path, blob.data):
+                        blob.derivatives = builder.encode(blob.data)
+                except (OSError, ValueError):
+                    pass  # The writer retries it and logs the failure
+    return result
+
+
+class Stage:
+    """Threads that apply fn to (key, item) pairs from inbox and put the results in outbox
+
+    Exceptions become Failed items. The last thread to see the end marker
+    forwards it, so each stage shuts down once its input is exhausted.
+    """
+
+    def __init__(self, name: str, fn: Callable, inbox: queue.Queue, outbox: queue.Queue, threads: int = 1):
+        self.name = name
+        self.fn = fn
+        self.inbox = inbox
+        self.outbox = outbox
+        self.busy = 0.0
+        self._lock = threading.Lock()
+        self._running = threads
+        self.threads = [threading.Thread(target=self._run, name=f"{name}-{i}", daemon=True)
+                        for i in range(threads)]
+        for thread in self.threads:
+            thread.start()
+
+    def _run(self):
+        while True:
+            item = self.inbox.get()
+            if item is _DONE:
+                self.inbox.put(_DONE)  # Let sibling threads see it too
+                with self._lock:
+                    self._running -= 1
+                    if self._running == 0:
+                        self.outbox.put(_DONE)
+                return
+
+            key, value = item
+            if not isinstance(value, Failed):
+                started = time.perf_counter()
+                try:
+                    value = self.fn(key, value)
+                except Exception as e:
+                    value = Failed(e)
+                with self._lock:
+                    self.busy += time.perf_counter() - started
+            self.outbox.put((key, value))
+
+
+def convert_pipelined(pdf_files: List[str], output_name_for: Callable[[str], str],
+                      write: Callable[[str, ConversionResult], Dict], fail: Callable[[str, Exception], Dict],
+                      parse_workers: int = 2, encode_threads: int = IMAGE_WORKERS,
+                      prefetch: int = PREFETCH_DOCUMENTS, passthrough: bool = False,
+                      image_profile: str = DEFAULT_PROFILE, derivatives: bool = False,
+                      on_result: Optional[Callable[[str, Dict], None]] = None) -> List[Dict]:
+    """Convert pdf_files through the staged pipeline
+
+    write(pdf_file, result) persists an analyzed result and returns its batch
+    entry; fail(pdf_file, error) builds the entry for a document that failed.
+    Entries are passed to on_result as they finish and returned in input order.
+    """
+    read_queue = queue.Queue(maxsize=prefetch)
+    parsed_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+    encoded_queue = queue.Queue(maxsize=STAGE_QUEUE_SIZE)
+    written_queue = queue.Queue()
+
+    def read(pdf_file, _):
+        with open(pdf_file, 'rb') as f:
+            return f.read()
+
+    executors = [ProcessPoolExecutor(max_workers=parse_workers)]
+    executor_lock = threading.Lock()
+
+    def parse(pdf_file, data):
+        args = (parse_pdf, data, pdf_file, output_name_for(pdf_file), passthrough, image_profile)
+        executor = executors[0]
+        try:
+            return executor.submit(*args).result()
+        except BrokenProcessPool:
+            with executor_lock:
+                if executors[0] is executor:  # First thread to notice replaces the pool
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executors[0] = ProcessPoolExecutor(max_workers=parse_workers)
+        # The crash failed every document in flight; retry this one alone so only the culprit fails
+        with ProcessPoolExecutor(max_workers=1) as isolated:
+            return isolated.submit(*args).result()
+
+    source = queue.Queue()
+    for pdf_file in pdf_files:
+        source.put((pdf_file, None))
+    source.put(_DONE)
+
+    # One parse thread per process: each waits on its own document
+    stages = [
+        Stage("read", read, source, read_queue),
+        Stage("parse", parse, read_queue, parsed_queue, threads=parse_workers),
+        Stage("encode", lambda pdf_file, result: encode_images(result, derivatives), parsed_queue, encoded_queue,
+              threads=encode_threads),
+        Stage("write", write, encoded_queue, written_queue),
+    ]
+
+    conversions = {}
+    try:
+        while True:
+            item = written_queue.get()
+            if item is _DONE:
+                break
+            pdf_file, value = item
+            conversion = fail(pdf_file, value.error) if isinstance(value, Failed) else value
+            conversions[pdf_file] = conversion
+            if on_result:
+                on_result(pdf_file, conversion)
+    finally:
+        executors[0].shutdown(wait=True, cancel_futures=True)
+
+    busy = ", ".join(f"{stage.name} {stage.busy:.1f}s" for stage in stages)
+    print(f"⏱️  Pipeline stage busy time: {busy}")
+    return [conversions[pdf_file] for pdf_file in pdf_files]
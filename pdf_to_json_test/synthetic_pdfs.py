@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Synthetic Scribe-Style PDF Generator
+Builds procedure PDFs that mimic Scribe exports, plus their ground-truth steps,
+for benchmarking and scale-testing the converters without customer documents
+"""
+
+import io
+import os
+import json
+import random
+import fitz
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, ImageDraw
+
+# Page geometry measured from real Scribe exports (A4, points)
+PAGE_WIDTH, PAGE_HEIGHT = 595.2756, 841.8898
+CARD_LEFT, CARD_RIGHT = 58.4, 536.9
+IMAGE_LEFT, IMAGE_RIGHT = 66.0, 530.0
+CONTENT_TOP, CONTENT_BOTTOM = 56.4, 790.0
+LOGO_RECT = fitz.Rect(451, 59, 551, 213)
+CARD_FILL = (0.945, 0.961, 0.976)
+FOOTER_TEXT = "Made with Scribe - https://scribehow.com"
+
+SCREENSHOT_SIZE = (1280, 713)
+LOGO_PIXELS = (258, 395)
+FORMATS = ("jpeg", "png", "mixed")
+LOGO_PLACEMENTS = ("first", "every", "none")
+
+ACTIONS = [
+    'Click "{target}"',
+    'Navigate to {place}',
+    'Select {target} from the list',
+    'Choose the {target} option',
+    'Enter the {field} for the {target}',
+    'Type "{value}"',
+    'Open the {place} settings',
+    'Save the {target} changes',
+    'Download the {target} report',
+]
+TARGETS = ["Inbound Rules", "Extensions", "Call Forwarding", "Users", "Phone Numbers",
+           "Routing", "Voicemail", "Office Hours", "Trunks", "Messaging Logs", "Backups"]
+PLACES = ["the Admin Console", "the Dashboard", "Account Settings", "the Billing page",
+          "the Monitor tab", "the Console home page"]
+FIELDS = ["name", "number", "email address", "destination", "password"]
+VALUES = ["sales@example.com", "+1 555 0100", "Main Office", "Support Queue", "forward-all"]
+
+
+def _encode(image: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    if fmt == "jpeg":
+        image.save(buffer, "JPEG", quality=quality)
+    else:
+        image.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def make_screenshot(size: Tuple[int, int], fmt: str, variant: int, quality: int = 85) -> bytes:
+    """Render a fake application screenshot (toolbar, sidebar, panels) as encoded image bytes"""
+    rng = random.Random(variant)
+    width, height = size
+    image = Image.new("RGB", size, (248, 249, 250))
+    draw = ImageDraw.Draw(image)
+
+    accent = tuple(rng.randint(40, 200) for _ in range(3))
+    draw.rectangle([0, 0, width, height // 12], fill=accent)
+    draw.rectangle([0, height // 12, width // 6, height], fill=(230, 232, 236))
+
+    for _ in range(rng.randint(4, 10)):
+        x0 = rng.randint(width // 6 + 10, width - 100)
+        y0 = rng.randint(height // 12 + 10, height - 60)
+        x1 = min(width - 10, x0 + rng.randint(80, width // 2))
+        y1 = min(height - 10, y0 + rng.randint(20, height // 3))
+        shade = rng.randint(200, 255)
+        draw.rectangle([x0, y0, x1, y1], fill=(shade, shade, shade), outline=(180, 180, 180))
+        for row in range(y0 + 8, y1 - 8, 18):
+            draw.line([x0 + 8, row, x0 + rng.randint(20, max(21, x1 - x0 - 8)), row], fill=(120, 120, 120), width=3)
+
+    # Scribe's orange click marker
+    cx, cy = rng.randint(50, width - 50), rng.randint(50, height - 50)
+    draw.ellipse([cx - 18, cy - 18, cx + 18, cy + 18], outline=(255, 106, 0), width=5)
+
+    return _encode(image, fmt, quality)
+
+
+def make_logo(fmt: str, quality: int = 85) -> bytes:
+    """Render a portrait logo with the size Scribe stamps on the first page"""
+    image = Image.new("RGB", LOGO_PIXELS, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.ellipse([29, 60, 229, 260], fill=(255, 106, 0))
+    draw.rectangle([49, 300, 209, 340], fill=(40, 40, 40))
+    return _encode(image, fmt, quality)
+
+
+def random_description(rng: random.Random) -> str:
+    return rng.choice(ACTIONS).format(
+        target=rng.choice(TARGETS), place=rng.choice(PLACES),
+        field=rng.choice(FIELDS), value=rng.choice(VALUES))
+
+
+class ProcedureBuilder:
+    """Lays out a Scribe-like procedure document page by page"""
+
+    def __init__(self, title: str, logo: str = "first", image_format: str = "jpeg", quality: int = 85):
+        self.doc = fitz.open()
+        self.title = title
+        self.logo = logo
+        self.image_format = image_format
+        self.quality = quality
+        self.page = None
+        self.y = CONTENT_TOP
+        self._images: Dict[Tuple, bytes] = {}
+        self._logo_xref = 0
+
+    @property
+    def page_num(self) -> int:
+        return self.doc.page_count
+
+    def image_bytes(self, size: Tuple[int, int], fmt: str, variant: int) -> bytes:
+        """Encoded screenshot, cached so large corpora do not re-render identical variants"""
+        key = (size, fmt, variant)
+        if key not in self._images:
+            self._images[key] = make_screenshot(size, fmt, variant, self.quality)
+        return self._images[key]
+
+    def new_page(self):
+        self.page = self.doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self.y = CONTENT_TOP
+        self.page.insert_text((50, 816), FOOTER_TEXT, fontsize=10, fontname="helv")
+        self.page.insert_text((539, 816), str(self.page_num), fontsize=10, fontname="helv")
+
+        if self.logo == "every" or (self.logo == "first" and self.page_num == 1):
+            # Re-use the logo xref after the first insertion, as Scribe does
+            if self._logo_xref:
+                self.page.insert_image(LOGO_RECT, xref=self._logo_xref)
+            else:
+                self._logo_xref = self.page.insert_image(LOGO_RECT, stream=make_logo(self._logo_format(), self.quality))
+
+    def _logo_format(self) -> str:
+        return "png" if self.image_format == "png" else "jpeg"
+
+    def add_title(self):
+        title_rect = fitz.Rect(50, 58, 430 if self.logo != "none" else 545, 240)
+        self.page.insert_textbox(title_rect, self.title, fontsize=20, fontname="hebo")
+        self.y = 268
+
+    def ensure_space(self, height: float):
+        if self.page is None or self.y + height > CONTENT_BOTTOM:
+            self.new_page()
+
+    def add_step(self, number: int, description: str, screenshot: Optional[Tuple[Tuple[int, int], str, int]]) -> Dict:
+        """Draw one step card (number badge, description, optional screenshot)"""
+        image_height = 0.0
+        if screenshot:
+            (width, height), _fmt, _variant = screenshot
+            image_height = (IMAGE_RIGHT - IMAGE_LEFT) * height / width
+        card_height = 44 + (image_height + 16 if screenshot else 0)
+
+        self.ensure_space(card_height)
+        top = self.y
+        self.page.draw_rect(fitz.Rect(CARD_LEFT, top, CARD_RIGHT, top + card_height),
+                            color=(0.85, 0.87, 0.9), fill=CARD_FILL, width=0.5)
+        self.page.draw_rect(fitz.Rect(65.4, top + 8, 93.4, top + 36), color=None, fill=(1, 1, 1))
+        self.page.insert_text((75, top + 27), str(number), fontsize=14, fontname="hebo")
+        self.page.insert_text((104, top + 26), description, fontsize=11, fontname="helv")
+
+        images = []
+        if screenshot:
+            (width, height), fmt, variant = screenshot
+            rect = fitz.Rect(IMAGE_LEFT, top + 47, IMAGE_RIGHT, top + 47 + image_height)
+            self.page.insert_image(rect, stream=self.image_bytes((width, height), fmt, variant))
+            images.append({"width": width, "height": height, "format": fmt, "variant": variant})
+
+        self.y = top + card_height + 47
+        return {"step_number": number, "description": description, "page": self.page_num, "images": images}
+
+    def add_continuation(self, number: int, screenshot: Tuple[Tuple[int, int], str, int]) -> Dict:
+        """Extra screenshot for a step, on its own page"""
+        self.new_page()
+        (width, height), fmt, variant = screenshot
+        image_height = (IMAGE_RIGHT - IMAGE_LEFT) * height / width
+        rect = fitz.Rect(IMAGE_LEFT, self.y, IMAGE_RIGHT, self.y + image_height)
+        self.page.insert_image(rect, stream=self.image_bytes((width, height), fmt, variant))
+        self.y += image_height + 47
+        return {"width": width, "height": height, "format": fmt, "variant": variant, "page": self.page_num}
+
+
+def generate_procedure(pdf_path: str, num_steps: int = 10, title: Optional[str] = None,
+                       screenshot_sizes: List[Tuple[int, int]] = None, image_format: str = "jpeg",
+                       logo: str = "first", pages_per_step: int = 0, screenshot_ratio: float = 0.8,
+                       variants: int = 0, quality: int = 85, seed: int = 0) -> Dict:
+    """Write one synthetic procedure PDF and return its ground truth
+
+    pages_per_step 0 packs steps onto pages the way Scribe does; N >= 1 starts
+    every step on a new page and gives it N pages (one screenshot per page).
+    variants limits how many distinct screenshots are rendered (0 = one per step).
+    """
+    rng = random.Random(seed)
+    screenshot_sizes = screenshot_sizes or [SCREENSHOT_SIZE]
+    title = title or f"{rng.choice(['Setup', 'Configure', 'Review', 'Export'])} {rng.choice(TARGETS)} in {rng.choice(['3CX', 'Twilio', 'Microsoft 365', 'DropSuite'])}"
+
+    def pick_screenshot(index):
+        fmt = rng.choice(("jpeg", "png")) if image_format == "mixed" else image_format
+        variant = seed * 100003 + (index % variants if variants else index)
+        return rng.choice(screenshot_sizes), fmt, variant
+
+    builder = ProcedureBuilder(title, logo=logo, image_format=image_format, quality=quality)
+    builder.new_page()
+    builder.add_title()
+
+    steps = []
+    shot_index = 0
+    for number in range(1, num_steps + 1):
+        description = random_description(rng)
+        if pages_per_step:
+            has_screenshot = True
+            if number > 1 or builder.y > 268:
+                builder.new_page()
+        else:
+            has_screenshot = rng.random() < screenshot_ratio
+
+        screenshot = pick_screenshot(shot_index) if has_screenshot else None
+        shot_index += 1 if screenshot else 0
+        step = builder.add_step(number, description, screenshot)
+
+        for _ in range(max(0, pages_per_step - 1)):
+            step["images"].append(builder.add_continuation(number, pick_screenshot(shot_index)))
+            shot_index += 1
+        steps.append(step)
+
+    builder.doc.set_metadata({"title": title, "creator": "synthetic_pdfs.py", "producer": "PyMuPDF"})
+    builder.doc.save(pdf_path, garbage=3, deflate=True)
+    page_count = builder.doc.page_count
+    builder.doc.close()
+
+    return {
+        "title": title,
+        "total_steps": len(steps),
+        "total_pages": page_count,
+        "steps": steps,
+        "generator": {
+            "seed": seed,
+            "screenshot_sizes": [list(size) for size in screenshot_sizes],
+            "image_format": image_format,
+            "logo": logo,
+            "pages_per_step": pages_per_step,
+            "screenshot_ratio": screenshot_ratio,
+            "variants": variants
+        }
+    }
+
+
+def truth_path(pdf_path: str) -> str:
+    """Ground-truth file written next to a generated PDF"""
+    return os.path.splitext(pdf_path)[0] + ".truth.json"
+
+
+def generate_corpus(output_dir: str, count: int, min_steps: int = 10, max_steps: int = 10,
+                    seed: int = 0, **options) -> List[str]:
+    """Generate count PDFs with step counts drawn from [min_steps, max_steps]"""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    pdf_paths = []
+
+    for i in range(count):
+        num_steps = rng.randint(min_steps, max_steps)
+        pdf_path = os.path.join(output_dir, f"synthetic_{i:05d}_{num_steps}steps.pdf")
+        truth = generate_procedure(pdf_path, num_steps=num_steps, seed=seed + i, **options)
+        with open(truth_path(pdf_path), 'w', encoding='utf-8') as f:
+            json.dump(truth, f, indent=2)
+        pdf_paths.append(pdf_path)
+
+    return pdf_paths
+
+
+def _parse_size(text: str) -> Tuple[int, int]:
+    width, height = text.lower().split('x')
+    return int(width), int(height)
+
+
+def _parse_range(text: str) -> Tuple[int, int]:
+    low, _, high = text.partition('-')
+    return int(low), int(high or low)
+
+
+def main():
+    """Command line entry point"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate synthetic Scribe-style procedure PDFs')
+    parser.add_argument('output_dir', help='Directory for the PDFs and their .truth.json files')
+    parser.add_argument('--count', type=int, default=10, help='Number of documents (default: 10)')
+    parser.add_argument('--steps', default='10', help='Steps per document, e.g. 25 or 10-1000 (default: 10)')
+    parser.add_argument('--screenshot-size', default='1280x713',
+                        help='Comma-separated screenshot pixel sizes, e.g. 1280x713,1920x1080')
+    parser.add_argument('--format', choices=FORMATS, default='jpeg', help='Screenshot encoding (default: jpeg)')
+    parser.add_argument('--quality', type=int, default=85, help='JPEG quality (default: 85)')
+    parser.add_argument('--logo', choices=LOGO_PLACEMENTS, default='first',
+                        help='Logo placement: first page (Scribe default), every page, or none')
+    parser.add_argument('--pages-per-step', type=int, default=0,
+                        help='0 packs steps like Scribe; N gives each step N pages with one screenshot each')
+    parser.add_argument('--screenshot-ratio', type=float, default=0.8,
+                        help='Fraction of steps with a screenshot when packing (default: 0.8)')
+    parser.add_argument('--variants', type=int, default=0,
+                        help='Distinct screenshots per document (default: 0, one per step)')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed (default: 0)')
+
+    args = parser.parse_args()
+
+    min_steps, max_steps = _parse_range(args.steps)
+    pdf_paths = generate_corpus(
+        args.output_dir, args.count, min_steps, max_steps, seed=args.seed,
+        screenshot_sizes=[_parse_size(size) for size in args.screenshot_size.split(',')],
+        image_format=args.format, logo=args.logo, pages_per_step=args.pages_per_step,
+        screenshot_ratio=args.screenshot_ratio, variants=args.variants, quality=args.quality)
+
+    total_bytes = sum(os.path.getsize(path) for path in pdf_paths)
+    print(f"✅ Generated {len(pdf_paths)} PDFs in {args.output_dir} ({total_bytes / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
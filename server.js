@@ -10,6 +10,7 @@ const fs = require('fs');
 const fsExtra = require('fs-extra');
 const multer = require('multer');
 const { chromium } = require('playwright');
+const { ConversionPool } = require('./conversion-pool');
 require('dotenv').config();
 
 const app = express();
@@ -249,6 +250,85 @@ app.get('/api/downloads', isAuthenticated, (req, res) => {
   }
 });
 
+// Warm Python converters, started on the first conversion request
+let conversionPool = null;
+
+function getConversionPool() {
+  if (!conversionPool) {
+    conversionPool = new ConversionPool({
+      size: parseInt(process.env.CONVERSION_WORKERS, 10) || 2,
+      python: process.env.PYTHON || 'python3',
+      maxJobsPerWorker: parseInt(process.env.CONVERSION_MAX_JOBS, 10) || 100
+    });
+  }
+  return conversionPool;
+}
+
+// Convert a downloaded PDF to JSON/HTML next to it in downloads/
+app.post('/api/convert/:filename', isAuthenticated, async (req, res) => {
+  try {
+    const downloadsDir = path.join(__dirname, 'downloads');
+    const filename = path.basename(req.params.filename);
+    const pdfPath = path.join(downloadsDir, filename);
+
+    if (!filename.toLowerCase().endsWith('.pdf') || !fs.existsSync(pdfPath)) {
+      return res.status(404).json({ success: false, error: 'PDF not found' });
+    }
+
+    const result = await getConversionPool().convert({
+      pdf_path: pdfPath,
+      output_dir: downloadsDir,
+      passthrough: req.body.passthrough === true
+    });
+
+    res.json({
+      success: true,
+      title: result.title,
+      steps: result.total_steps,
+      images: result.total_images,
+      warnings: result.warnings,
+      files: {
+        json: path.basename(result.json_file),
+        html: path.basename(result.html_file),
+        report: path.basename(result.report_file)
+      },
+      elapsed: result.elapsed
+    });
+  } catch (error) {
+    console.error('Conversion error:', error);
+    res.status(500).json({ success: false, error: error.message });
+  }
+});
+
+// Convert an uploaded PDF without writing it (or its outputs) to disk
+const pdfUpload = multer({
+  storage: multer.memoryStorage(),
+  limits: { fileSize: 100 * 1024 * 1024 }, // 100MB limit
+  fileFilter: function (req, file, cb) {
+    if (file.mimetype === 'application/pdf' || path.extname(file.originalname).toLowerCase() === '.pdf') {
+      return cb(null, true);
+    }
+    cb(new Error('Only PDF files are allowed'));
+  }
+});
+
+app.post('/api/convert-upload', isAuthenticated, pdfUpload.single('pdf'), async (req, res) => {
+  try {
+    if (!req.file) {
+      return res.status(400).json({ success: false, error: 'No PDF uploaded' });
+    }
+
+    const result = await getConversionPool().convertBuffer(req.file.buffer, req.file.originalname, {
+      includeImages: req.query.images === '1'
+    });
+
+    res.json({ success: true, ...result });
+  } catch (error) {
+    console.error('Conversion error:', error);
+    res.status(500).json({ success: false, error: error.message });
+  }
+});
+
 // Editor Routes
 app.get('/editor', isAuthenticated, (req, res) => {
   res.sendFile(path.join(__dirname, 'public', 'editor.html'));
@@ -665,6 +745,15 @@ app.use((req, res, next) => {
   next();
 });
 
+for (const signal of ['SIGINT', 'SIGTERM']) {
+  process.on(signal, () => {
+    if (conversionPool) {
+      conversionPool.close();
+    }
+    process.exit(0);
+  });
+}
+
 app.listen(PORT, () => {
   console.log(`🔒 Secure server running on http://localhost:${PORT}`);
   console.log(`🔑 Login at http://localhost:${PORT}/login`);